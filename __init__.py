@@ -28,7 +28,13 @@ __contributors__ = {}
 __url__ = '' # 'http://supybot.com/Members/yourname/NFL/download'
 
 import config
+import fetch
+import parsers
+import teams
 import plugin
+reload(fetch)
+reload(parsers)
+reload(teams)
 reload(plugin) # In case we're being reloaded.
 reload(config)
 # Add more reloads here if you add third-party modules and want them to be
@@ -17,8 +17,51 @@ def configure(advanced):
     conf.registerPlugin('NFL', True)
 
 
+class FixtureMode(registry.OnlySomeStrings):
+    """Must be one of: off, record or replay."""
+    validStrings = ('off', 'record', 'replay')
+
+class ParserBackend(registry.OnlySomeStrings):
+    """Must be one of: lxml or bs3."""
+    validStrings = ('lxml', 'bs3')
+
 NFL = conf.registerPlugin('NFL')
 conf.registerGlobalValue(NFL, 'logURLs', registry.Boolean(True, """Should we log all URL calls?"""))
+conf.registerGlobalValue(NFL, 'cacheEnabled', registry.Boolean(True, """Should we cache fetched pages in memory?"""))
+conf.registerGlobalValue(NFL, 'cacheMaxBytes', registry.PositiveInteger(16777216, """Maximum size (bytes) of all cached pages before least recently used ones are evicted."""))
+conf.registerGlobalValue(NFL, 'cacheDefaultTTL', registry.NonNegativeInteger(60, """Seconds to cache a page when no cacheTTLs entry matches it."""))
+conf.registerGlobalValue(NFL, 'cacheTTLs', registry.SpaceSeparatedListOfStrings(['scores.espn.go.com=30',
+    'sports-ak.espn.go.com/nfl/standings=300', 'espn.go.com/nfl/powerrankings=1800', 'espn.go.com/nfl/player=300', 'espn.go.com=600',
+    'm.espn.go.com=300', 'insider.espn.go.com=600', 'www.pro-football-reference.com/hof=86400', 'www.pro-football-reference.com/super-bowl=86400',
+    'www.pro-football-reference.com=3600', 'www.spotrac.com=3600', 'www.rotoworld.com=300', 'dev.rotoworld.com=120', 's3.amazonaws.com/nflgc=120',
+    'sports.yahoo.com=600', 'www.nflweather.com=600', 'hosted.stats.com=600', 'en.wikipedia.org=86400', 'www.drafthistory.com=86400',
+    'www.fftoolbox.com=3600', 'www.forbes.com=86400', 'www.justfines.com=3600', 'arrestnation.com=1800'],
+    """Per-source cache TTLs as host[/path]=seconds. The most specific match wins."""))
+conf.registerGlobalValue(NFL, 'cacheStaleTTLs', registry.SpaceSeparatedListOfStrings(['sports-ak.espn.go.com/nfl/standings=1800',
+    'espn.go.com/nfl/powerrankings=86400', 's3.amazonaws.com/nflgc=600'],
+    """Sources served stale-while-revalidate as host[/path]=seconds. Once an entry expires it is still served for up to
+    this many seconds while one background fetch refreshes it. Sources not listed are always fetched in the foreground."""))
+conf.registerGlobalValue(NFL, 'httpTimeout', registry.PositiveInteger(15, """Seconds to wait on an upstream connection before giving up."""))
+conf.registerGlobalValue(NFL, 'httpMaxConnsPerHost', registry.PositiveInteger(4, """Maximum keep-alive connections open at once to a single upstream host."""))
+conf.registerGlobalValue(NFL, 'httpIdleTimeout', registry.PositiveInteger(60, """Seconds an idle keep-alive connection is kept before it is closed."""))
+conf.registerGlobalValue(NFL, 'httpMaxBytes', registry.PositiveInteger(4194304, """Largest (decompressed) page body in bytes we will read. Anything past this is cut off."""))
+conf.registerGlobalValue(NFL, 'httpMaxBytesPerSource', registry.SpaceSeparatedListOfStrings([], """Per-source overrides of httpMaxBytes as host[/path]=bytes."""))
+conf.registerGlobalValue(NFL, 'httpRatePerHost', registry.Float(5.0, """Requests per second allowed to a single upstream host (token bucket refill rate)."""))
+conf.registerGlobalValue(NFL, 'httpBurstPerHost', registry.PositiveInteger(10, """Requests that can go to a single upstream host in a burst before httpRatePerHost kicks in."""))
+conf.registerGlobalValue(NFL, 'httpBreakerThreshold', registry.PositiveInteger(5, """Consecutive failures (timeouts, connection errors, 5xx) before we stop talking to a host for a while."""))
+conf.registerGlobalValue(NFL, 'httpBreakerCooldown', registry.PositiveInteger(60, """Seconds to fail fast against a failing host before probing it again."""))
+conf.registerGlobalValue(NFL, 'commandBudget', registry.NonNegativeInteger(20, """Seconds a command gets to fetch, parse and reply
+    before it gives up with a short error (or a cached copy). 0 means no budget."""))
+conf.registerGlobalValue(NFL, 'parser', ParserBackend('lxml', """HTML parser backend. lxml is much faster. bs3 (BeautifulSoup 3) is
+    always available and is used anyway if lxml isn't installed."""))
+conf.registerGlobalValue(NFL, 'parserMaxTrees', registry.PositiveInteger(4, """Most commands that may hold parsed pages in memory at once.
+    Others wait for one to finish (within their commandBudget)."""))
+conf.registerGlobalValue(NFL, 'dbCheckInterval', registry.NonNegativeInteger(5, """Seconds between checks of nfl.db and nfl_players.db for changes.
+    A changed db is read again in the background and replaces the one in memory once complete."""))
+conf.registerGlobalValue(NFL, 'fixtureMode', FixtureMode('off', """Record every fetched page to the fixture archive (record),
+    serve pages only from it without touching the network (replay), or neither (off)."""))
+conf.registerGlobalValue(NFL, 'fixtureDir', registry.String('', """Directory of the fixture archive. Defaults to fixtures/ in the plugin directory."""))
+conf.registerGlobalValue(NFL, 'fixtureLatency', registry.NonNegativeInteger(0, """Artificial delay (milliseconds) added to each replayed fixture."""))
 conf.registerGlobalValue(NFL, 'pffCookie', registry.String('',  """pff Cookie value for testing""",private=True))
 
 # vim:set shiftwidth=4 tabstop=4 expandtab textwidth=250:
@@ -5,13 +5,19 @@ import argparse
 import sqlite3
 from base64 import b64decode
 import json
+import os
+import sys
 import urllib
-import urllib2
-from BeautifulSoup import BeautifulSoup
 import re
 from metaphone import doublemetaphone
+# shared http layer lives in the plugin directory.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+import fetch
+import parsers
 # WHERE IS THE DB?
 DB="../nfl_players.db"
+# HTML PARSER BACKEND (lxml or bs3)
+PARSER="lxml"
 
 # INTERNALS
 def _sanitizeName(name):
@@ -103,11 +109,9 @@ def _eidnamelookup(eid):
     """
 
     url = b64decode('aHR0cDovL20uZXNwbi5nby5jb20vbmZsL3BsYXllcmluZm8/cGxheWVySWQ9') + eid + '&wjb='
-    req = urllib2.Request(url)
-    r = urllib2.urlopen(req)
-    html = r.read()
+    html = fetch.get(url).body
     try:
-        soup = BeautifulSoup(html)
+        soup = parsers.parse(html, PARSER, convertEntities=None)
         team = soup.find('td', attrs={'class':'teamHeader'}).find('b')
         name = soup.find('div', attrs={'class':'sub bold'})
         return "{0} {1}".format(team.getText(), name.getText())
@@ -125,9 +129,7 @@ def _rotofind(searchname, ridsonly=False):
     url = b64decode('aHR0cDovL3d3dy5yb3Rvd29ybGQuY29tL2NvbnRlbnQvcGxheWVyc2VhcmNoLmFzcHg/') + "searchname=" + pn + "&sport=nfl"
     # do our request.
     try:
-        req = urllib2.Request(url)
-        r = urllib2.urlopen(req)
-        html = r.read()
+        html = fetch.get(url).body
     except Exception, e:
         print "ERROR: _rotofind: in HTTP request: {0}".format(e)
         return None
@@ -135,7 +137,7 @@ def _rotofind(searchname, ridsonly=False):
     output = []
     # process.
     if 'Search Results for:' in html:  # usually not a good sign.
-        soup = BeautifulSoup(html)
+        soup = parsers.parse(html, PARSER, convertEntities=None)
         table = soup.find('table', attrs={'id':'cp1_tblSearchResults'})
         if table:  # this means we found more than one person.
             rows = table.findAll('tr')[2:]
@@ -153,7 +155,7 @@ def _rotofind(searchname, ridsonly=False):
             return None
             #print "I did not find any results for {0}".format(searchname)
     else:  # this means we found a person.
-        soup = BeautifulSoup(html)
+        soup = parsers.parse(html, PARSER, convertEntities=None)
         playername = soup.find('div', attrs={'class':'playername'})
         playerid = soup.find('div', attrs={'class':'fb-like'})['data-href']
         playerid = playerid.split('/')[5]
@@ -184,12 +186,12 @@ def _activerosters(pnames=False):
             ]
     # wrap in a big try/except block. dirty but works.
     try:
-        for team in teams:
-            url = b64decode('aHR0cDovL2VzcG4uZ28uY29tL25mbC90ZWFtL3Jvc3Rlcg==') + '/_/name/' + team + '/'
-            req = urllib2.Request(url)
-            req.add_header("User-Agent","Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:17.0) Gecko/17.0 Firefox/17.0")
-            r = urllib2.urlopen(req)
-            soup = BeautifulSoup(r.read())
+        # fetch all roster pages at once and parse each as it lands.
+        urls = [b64decode('aHR0cDovL2VzcG4uZ28uY29tL25mbC90ZWFtL3Jvc3Rlcg==') + '/_/name/' + team + '/' for team in teams]
+        for (url, r, e) in fetch.getmany(urls, headers={"User-Agent":"Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:17.0) Gecko/17.0 Firefox/17.0"}, workers=fetch.pool.maxperhost, timeout=120):
+            if e:  # one bad page spoils the set.
+                raise e
+            soup = parsers.parse(r.body, PARSER, convertEntities=None)
             div = soup.find('div', attrs={'class':'col-main', 'id':'my-players-table'})
             table = div.find('table', attrs={'class':'tablehead', 'cellpadding':'3', 'cellspacing':'1'})
             rows = table.findAll('tr', attrs={'class':re.compile(r'(odd|even)row')})
@@ -216,10 +218,8 @@ def _eidnamefetch(eid):
 
     try:
         url = 'http://api.espn.com/v1/sports/football/nfl/athletes/%s?apikey=dha4fmjhb6q36zffzkech2zn' % str(eid)
-        req = urllib2.Request(url)
-        req.add_header("User-Agent","Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:17.0) Gecko/17.0 Firefox/17.0")
-        r = urllib2.urlopen(req)
-        data = json.loads(r.read())
+        r = fetch.get(url, headers={"User-Agent":"Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:17.0) Gecko/17.0 Firefox/17.0"})
+        data = json.loads(r.body)
         data = data['sports'][0]['leagues'][0]['athletes'][0]
         fn = data['fullName']
         return fn
@@ -0,0 +1,783 @@
+# -*- coding: utf-8 -*-
+###
+# Copyright (c) 2012-2014, spline
+# All rights reserved.
+###
+# HTTP fetch layer shared by the plugin. No supybot imports in here.
+import collections
+import hashlib
+import httplib
+import json
+import os
+import Queue
+import socket
+import threading
+import time
+import urlparse
+import zlib
+
+
+class FetchError(Exception):
+    """Raised when a page cannot be fetched."""
+    pass
+
+
+class CircuitOpen(FetchError):
+    """Raised without going out when a host's circuit breaker is open."""
+    pass
+
+
+class RateLimited(FetchError):
+    """Raised without going out when a host's rate limit would make us wait
+    longer than the request may."""
+    pass
+
+
+class PoolExhausted(FetchError):
+    """Raised when no pooled connection to a host frees up in time. Our own
+    load, so it never counts against the host's circuit breaker."""
+    pass
+
+
+class DeadlineExceeded(FetchError):
+    """Raised when the calling thread's time budget (see setdeadline) runs out."""
+    pass
+
+
+#############
+# DEADLINES #
+#############
+
+_budget = threading.local()
+
+
+def setdeadline(seconds):
+    """Give the calling thread seconds to finish its work (None for no limit).
+    Fetches made on this thread cap their timeouts at what is left. Returns
+    the deadline this replaced, for restoredeadline."""
+
+    previous = getattr(_budget, 'deadline', None)
+    _budget.deadline = time.time() + seconds if seconds else None
+    return previous
+
+
+def restoredeadline(deadline):
+    """Put back a deadline setdeadline returned."""
+
+    _budget.deadline = deadline
+
+
+def timeleft():
+    """Seconds left in the calling thread's budget, or None if it has none."""
+
+    deadline = getattr(_budget, 'deadline', None)
+    if deadline is None:
+        return None
+    return max(deadline - time.time(), 0)
+
+
+def checkdeadline():
+    """Raise DeadlineExceeded if the calling thread's budget has run out."""
+
+    if timeleft() == 0:
+        raise DeadlineExceeded("Deadline exceeded.")
+
+
+#################
+# HTTP FETCHING #
+#################
+
+class Response(object):
+    """Status, headers (lowercased keys) and body of a fetched url. stopped is True
+    when we quit reading at a stop marker, truncated when the body hit maxbytes."""
+
+    __slots__ = ('url', 'status', 'headers', 'body', 'stopped', 'truncated')
+
+    def __init__(self, url, status, headers, body, stopped=False, truncated=False):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.stopped = stopped
+        self.truncated = truncated
+
+
+class StopScanner(object):
+    """Watches a body go by in chunks for a stop marker. stop is either a string,
+    or a (start, end) pair meaning 'the first end after start'."""
+
+    def __init__(self, stop):
+        if isinstance(stop, basestring):
+            stop = (None, stop)
+        (self.start, self.end) = stop
+        self.started = self.start is None
+        self._tail = ''
+
+    def feed(self, chunk):
+        """Look at the next chunk. Returns True once the marker has gone by."""
+
+        window = self._tail + chunk
+        if not self.started:
+            i = window.find(self.start)
+            if i < 0:
+                self._tail = window[-len(self.start) + 1:] if len(self.start) > 1 else ''
+                return False
+            self.started = True
+            window = window[i + len(self.start):]
+        if self.end in window:
+            return True
+        self._tail = window[-len(self.end) + 1:] if len(self.end) > 1 else ''
+        return False
+
+
+def _decoder(encoding):
+    """Return a zlib decompressor for a Content-Encoding, or None for identity."""
+
+    if encoding == 'gzip' or encoding == 'x-gzip':
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return zlib.decompressobj()
+    return None
+
+
+def readbody(resp, maxbytes=None, stop=None, chunksize=16384):
+    """Stream resp's body in chunks, gunzipping/inflating as it arrives. Quits early
+    once stop (see StopScanner) has been read or the decoded body goes past maxbytes.
+    Returns (body, stopped, truncated)."""
+
+    decoder = _decoder((resp.getheader('content-encoding') or '').strip().lower())
+    scanner = StopScanner(stop) if stop else None
+    chunks, size, first = [], 0, True
+    while True:
+        data = resp.read(chunksize)
+        if not data:
+            if decoder:
+                data = decoder.flush()
+                if data:
+                    chunks.append(data)
+            break
+        if decoder:
+            try:
+                data = decoder.decompress(data)
+            except zlib.error:
+                if not first:
+                    raise
+                decoder = zlib.decompressobj(-zlib.MAX_WBITS)  # raw deflate without the zlib header.
+                data = decoder.decompress(data)
+        first = False
+        checkdeadline()  # a slow trickle can't outlive the budget.
+        if maxbytes and size + len(data) > maxbytes:
+            chunks.append(data[:maxbytes - size])
+            return (''.join(chunks), False, True)
+        chunks.append(data)
+        size += len(data)
+        if scanner and scanner.feed(data):
+            return (''.join(chunks), True, False)
+    return (''.join(chunks), False, False)
+
+
+class FixtureArchive(object):
+    """On-disk archive of responses so commands can run without a network. In
+    record mode every response fetched is saved (body, headers and timestamp).
+    In replay mode responses only come from the archive, after latency seconds
+    of artificial delay. Each url is a <sha1>.json/<sha1>.body pair under path."""
+
+    def __init__(self, path, mode='replay', latency=0):
+        self.path = path
+        self.mode = mode
+        self.latency = latency
+
+    def _name(self, url, data=None):
+        """Base filename (no extension) for url (and POST data)."""
+
+        key = url if not data else "{0}\0{1}".format(url, data)
+        return os.path.join(self.path, hashlib.sha1(key).hexdigest())
+
+    def save(self, url, data, response):
+        """Store response for url (and POST data)."""
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        name = self._name(url, data)
+        meta = {'url': url, 'final': response.url, 'status': response.status,
+                'headers': response.headers, 'recorded': time.time()}
+        for (ext, content, mode) in (('.body', response.body, 'wb'), ('.json', json.dumps(meta, indent=1), 'w')):
+            with open(name + ext + '.tmp', mode) as f:  # write then rename so replay never sees half a file.
+                f.write(content)
+            os.rename(name + ext + '.tmp', name + ext)
+
+    def load(self, url, data=None):
+        """Return the archived Response for url. Raises FetchError if we never recorded it."""
+
+        name = self._name(url, data)
+        try:
+            with open(name + '.json') as f:
+                meta = json.load(f)
+            with open(name + '.body', 'rb') as f:
+                body = f.read()
+        except (IOError, ValueError):
+            raise FetchError("No fixture recorded for {0}".format(url))
+        if self.latency:
+            time.sleep(self.latency)
+        headers = dict([(str(k), str(v)) for (k, v) in meta['headers'].items()])
+        return Response(str(meta['final']), meta['status'], headers, body)
+
+
+class TokenBucket(object):
+    """Token bucket: rate tokens per second, holding at most burst."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.time()
+        self._lock = threading.Lock()
+
+    def acquire(self, maxwait):
+        """Take a token, sleeping until one is due. Returns False (taking nothing)
+        if that would mean waiting longer than maxwait seconds."""
+
+        with self._lock:
+            now = time.time()
+            self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            self.tokens -= 1  # reserve ours. negative means we're queued.
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+            if wait > maxwait:  # give it back.
+                self.tokens += 1
+                return False
+        if wait:
+            time.sleep(wait)
+        return True
+
+
+class HostGuards(object):
+    """Per-host rate limiting and circuit breaking. After threshold consecutive
+    failures a host's circuit opens and requests fail fast for cooldown seconds.
+    Then one probe request is let through: success closes the circuit, failure
+    opens it for another cooldown."""
+
+    def __init__(self, rate=5.0, burst=10, threshold=5, cooldown=60):
+        self.rate = rate
+        self.burst = burst
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._buckets = {}
+        self._failures = collections.Counter()  # host -> consecutive failures.
+        self._openuntil = {}  # host -> time the circuit may be probed.
+        self._probing = set()  # hosts with a probe out.
+        self._lock = threading.Lock()
+
+    def admit(self, host, maxwait):
+        """Wait for host's rate limit, then check its circuit. Raises RateLimited or CircuitOpen.
+        Returns True if this request is the probe of a half-open circuit: the
+        caller must then release(host) once it is done, however it ends."""
+
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if not bucket:
+                bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+            bucket.rate, bucket.burst = self.rate, self.burst
+        if not bucket.acquire(maxwait):
+            raise RateLimited("Rate limited talking to {0}".format(host))
+        with self._lock:
+            if self._failures[host] < self.threshold:  # closed.
+                return False
+            if time.time() < self._openuntil.get(host, 0) or host in self._probing:
+                raise CircuitOpen("{0} is failing. Not trying again until it cools down.".format(host))
+            self._probing.add(host)  # half-open. this request is the probe.
+            return True
+
+    def release(self, host):
+        """The probe for host is over. Lets another through if it ended without
+        success() or failure() (our budget ran out, say). Failures are untouched."""
+
+        with self._lock:
+            self._probing.discard(host)
+
+    def success(self, host):
+        """host answered. Close its circuit."""
+
+        with self._lock:
+            self._failures.pop(host, None)
+            self._openuntil.pop(host, None)
+            self._probing.discard(host)
+
+    def failure(self, host):
+        """host failed (connect error, timeout or 5xx). Maybe open its circuit."""
+
+        with self._lock:
+            self._failures[host] += 1
+            self._probing.discard(host)
+            if self._failures[host] >= self.threshold:
+                self._openuntil[host] = time.time() + self.cooldown
+
+    def opened(self):
+        """Return a sorted list of hosts whose circuit is open."""
+
+        with self._lock:
+            return sorted([h for (h, n) in self._failures.items() if n >= self.threshold])
+
+
+class ConnectionPool(object):
+    """Keep-alive httplib connections pooled per (scheme, host, port).
+    At most maxperhost connections per host are out at once; idle ones
+    older than idletimeout seconds are closed (reaped) on the next checkout."""
+
+    def __init__(self, maxperhost=4, idletimeout=60, timeout=30, guards=None):
+        self.maxperhost = maxperhost
+        self.idletimeout = idletimeout
+        self.timeout = timeout
+        self.guards = guards  # optional HostGuards.
+        self.fixtures = None  # optional FixtureArchive (record/replay).
+        self._idle = collections.defaultdict(list)  # key -> [(conn, lastused), ...]
+        self._busy = collections.Counter()  # key -> connections checked out.
+        self._cond = threading.Condition()
+
+    def _checkout(self, key, timeout):
+        """Return (conn, reused) for key, waiting up to timeout for a free slot."""
+
+        deadline = time.time() + timeout
+        with self._cond:
+            self._reap()
+            while self._busy[key] >= self.maxperhost:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise PoolExhausted("Timed out waiting for a connection to {0}".format(key[1]))
+                self._cond.wait(remaining)
+            self._busy[key] += 1
+            if self._idle[key]:  # most recently used first. likeliest to still be open.
+                conn, lastused = self._idle[key].pop()
+                return (conn, True)
+        (scheme, host, port) = key
+        if scheme == 'https':
+            return (httplib.HTTPSConnection(host, port, timeout=timeout), False)
+        return (httplib.HTTPConnection(host, port, timeout=timeout), False)
+
+    def _checkin(self, key, conn, reusable):
+        """Hand a connection back. Keep it around if the server let us."""
+
+        if not reusable:
+            conn.close()
+        with self._cond:
+            if reusable:
+                self._idle[key].append((conn, time.time()))
+            self._busy[key] -= 1
+            self._cond.notify_all()
+
+    def _reap(self):
+        """Close idle connections past idletimeout. Hold the lock."""
+
+        cutoff = time.time() - self.idletimeout
+        for key, idle in self._idle.items():
+            keep = [(conn, lastused) for (conn, lastused) in idle if lastused > cutoff]
+            for (conn, lastused) in idle:
+                if lastused <= cutoff:
+                    conn.close()
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+
+    def reap(self):
+        """Close idle connections past idletimeout."""
+
+        with self._cond:
+            self._reap()
+
+    def closeall(self):
+        """Close every idle connection. Used on unload."""
+
+        with self._cond:
+            for idle in self._idle.values():
+                for (conn, lastused) in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def _roundtrip(self, key, method, path, headers, data, timeout, maxbytes=None, stop=None):
+        """One request/response on a pooled connection. A reused connection the
+        server already dropped gets one retry on a fresh one. Connections we quit
+        reading early (see readbody) can't be reused and get closed."""
+
+        for attempt in (0, 1):
+            conn, reused = self._checkout(key, timeout)
+            reusable = False
+            try:
+                conn.timeout = timeout
+                if conn.sock:  # reused socket. apply this request's timeout.
+                    conn.sock.settimeout(timeout)
+                conn.request(method, path, data, headers)
+                resp = conn.getresponse()
+                (body, stopped, truncated) = readbody(resp, maxbytes, stop)
+                reusable = not (resp.will_close or stopped or truncated)
+                return (resp.status, resp.reason, dict(resp.getheaders()), body, stopped, truncated)
+            except zlib.error as e:
+                raise FetchError("Bad compressed body: {0}".format(e))
+            except (socket.error, httplib.HTTPException) as e:
+                if reused and attempt == 0 and not isinstance(e, socket.timeout):
+                    continue  # stale keep-alive. try again on a new connection.
+                raise
+            finally:
+                self._checkin(key, conn, reusable)
+
+    def get(self, url, headers=None, data=None, timeout=None, redirects=5, maxbytes=None, stop=None):
+        """Fetch url and return a Response, following redirects. POSTs if data is given.
+        Bodies are requested compressed and decoded on the fly; reading stops at
+        maxbytes or once stop has arrived (see readbody). A 304 comes back as a
+        Response with an empty body. Anything else that isn't a 2xx raises FetchError."""
+
+        fixtures = self.fixtures
+        if fixtures and fixtures.mode == 'replay':  # no network at all.
+            return fixtures.load(url, data)
+        if fixtures and fixtures.mode == 'record':  # archive whole pages.
+            maxbytes, stop = None, None
+        requested = url
+        timeout = timeout or self.timeout
+        method = 'POST' if data else 'GET'
+        headers = dict(headers or {})
+        if not [k for k in headers if k.lower() == 'accept-encoding']:
+            headers['Accept-Encoding'] = 'gzip, deflate'
+        for hop in range(redirects + 1):
+            (scheme, netloc, path, query, frag) = urlparse.urlsplit(url)
+            if scheme not in ('http', 'https') or not netloc:
+                raise FetchError("Invalid URL: {0}".format(url))
+            host, sep, port = netloc.rpartition(':')
+            if not sep or not port.isdigit():  # no port given.
+                host, port = netloc, (443 if scheme == 'https' else 80)
+            if query:
+                path += '?' + query
+            left = timeleft()
+            if left is not None:  # never wait past the caller's budget.
+                checkdeadline()
+                timeout = min(timeout, left)
+            probe = self.guards.admit(host, timeout) if self.guards else False
+            try:
+                (status, reason, rheaders, body, stopped, truncated) = self._roundtrip((scheme, host, int(port)), method, path or '/',\
+                    headers, data, timeout, maxbytes, stop)
+            except (DeadlineExceeded, PoolExhausted):  # ours, not the host's.
+                raise
+            except (socket.error, httplib.HTTPException, FetchError) as e:
+                if isinstance(e, socket.timeout):
+                    checkdeadline()  # our budget ran out. not the host's fault.
+                if self.guards:
+                    self.guards.failure(host)
+                if isinstance(e, socket.timeout):
+                    raise FetchError("Connection timed out.")
+                raise FetchError(str(e) or e.__class__.__name__)
+            else:
+                if self.guards:  # 5xx is the host's fault. 4xx is ours.
+                    if status >= 500:
+                        self.guards.failure(host)
+                    else:
+                        self.guards.success(host)
+            finally:
+                if probe:  # a probe cut short must not keep the circuit shut for good.
+                    self.guards.release(host)
+            if status in (301, 302, 303, 307) and rheaders.get('location'):
+                url = urlparse.urljoin(url, rheaders['location'])
+                if status != 307:  # browsers turn these into a GET.
+                    method, data = 'GET', None
+                continue
+            if status == 304:
+                return Response(url, status, rheaders, '')
+            if not 200 <= status < 300:
+                raise FetchError("HTTP Error {0}: {1}".format(status, reason))
+            response = Response(url, status, rheaders, body, stopped, truncated)
+            if fixtures and fixtures.mode == 'record':
+                fixtures.save(requested, data, response)
+            return response
+        raise FetchError("Too many redirects fetching {0}".format(url))
+
+
+pool = ConnectionPool()  # default pool for scripts.
+
+
+def get(url, headers=None, data=None, timeout=None, maxbytes=None, stop=None):
+    """Fetch url through the default pool. See ConnectionPool.get."""
+
+    return pool.get(url, headers=headers, data=data, timeout=timeout, maxbytes=maxbytes, stop=stop)
+
+
+def fanout(func, items, workers=8, timeout=None):
+    """Run func(item) for every item on up to workers threads, yielding
+    (item, result, error) as each one finishes, so a batch of pages takes about
+    as long as the slowest page instead of the sum. timeout (seconds) is a
+    deadline shared by the whole batch: anything unfinished by then is yielded
+    with a FetchError and anything not yet started is never run. Workers run on
+    the caller's budget too (see setdeadline)."""
+
+    todo = collections.deque(enumerate(items))
+    if not todo:
+        return
+    inherited = getattr(_budget, 'deadline', None)  # workers share the caller's budget.
+    deadline = time.time() + timeout if timeout else None
+    if inherited and (not deadline or inherited < deadline):
+        deadline = inherited
+    done = Queue.Queue()
+    lock = threading.Lock()
+
+    def worker():
+        _budget.deadline = inherited
+        while True:
+            with lock:
+                if not todo:
+                    return
+                (i, item) = todo.popleft()
+            try:
+                done.put((i, item, func(item), None))
+            except Exception as e:
+                done.put((i, item, None, e))
+
+    pending = dict(todo)
+    for _ in range(min(workers, len(todo))):
+        t = threading.Thread(target=worker)
+        t.daemon = True  # a hung func must not keep the process alive.
+        t.start()
+    while pending:
+        try:
+            if deadline:
+                (i, item, result, error) = done.get(timeout=max(deadline - time.time(), 0))
+            else:
+                (i, item, result, error) = done.get()
+        except Queue.Empty:  # out of time. stop the workers picking up more.
+            with lock:
+                todo.clear()
+            for (i, item) in sorted(pending.items()):
+                yield (item, None, FetchError("Deadline passed before {0} finished".format(item)))
+            return
+        del pending[i]
+        yield (item, result, error)
+
+
+def getmany(urls, headers=None, workers=8, timeout=None):
+    """Fetch urls concurrently through the default pool, yielding
+    (url, Response, error) as each finishes. See fanout."""
+
+    return fanout(lambda url: get(url, headers=headers, timeout=timeout), urls, workers, timeout)
+
+
+class _Call(object):
+    """An in-flight SingleFlight call."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """Coalesce concurrent calls for the same key. The first caller (leader)
+    runs the function; everyone arriving while it runs waits for it and gets
+    the same result, or the same exception. The exception is the leader's
+    DeadlineExceeded: that was its budget running out, not the key failing,
+    so its followers go again (one of them leading) on their own budgets."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0  # calls that piggybacked on a leader.
+
+    def inflight(self, key):
+        """Is there a call running for key right now?"""
+
+        with self._lock:
+            return key in self._calls
+
+    def do(self, key, func, *args, **kwargs):
+        """Run func(*args, **kwargs) for key unless a call for key is already
+        running, in which case wait for that one and share its outcome."""
+
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = self._calls[key] = _Call()
+                else:
+                    self.coalesced += 1
+            if leader:
+                break
+            call.done.wait(timeleft())  # wait on the leader, but not past our own budget.
+            if not call.done.is_set():
+                raise DeadlineExceeded("Deadline exceeded waiting on {0}".format(key))
+            if isinstance(call.error, DeadlineExceeded):  # the leader ran out of time. try again.
+                checkdeadline()
+                continue
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+
+#################
+# TTL POLICIES  #
+#################
+
+_policycache = {}  # memo of parsed policy lists, keyed by the raw entries.
+
+
+def parsepolicies(entries):
+    """Parse a list of 'host[/path]=value' strings into (host, path, value) tuples.
+    Most specific (longest host+path) rules come first. Bad entries are skipped."""
+
+    key = tuple(entries)
+    if key in _policycache:
+        return _policycache[key]
+    policies = []
+    for entry in entries:
+        try:  # split off the value first since paths can contain =.
+            source, value = entry.rsplit('=', 1)
+            host, sep, path = source.partition('/')
+            policies.append((host.lower(), '/' + path, int(value)))
+        except ValueError:  # malformed. ignore it.
+            continue
+    policies.sort(key=lambda x: len(x[0]) + len(x[1]), reverse=True)
+    _policycache[key] = policies
+    return policies
+
+
+def lookuppolicy(entries, url, default):
+    """Return the value of the first policy matching url's host and path, else default."""
+
+    (scheme, netloc, path, query, frag) = urlparse.urlsplit(url)
+    host = netloc.lower().split(':')[0]
+    for (phost, ppath, value) in parsepolicies(entries):
+        if (host == phost or host.endswith('.' + phost)) and path.startswith(ppath):
+            return value
+    return default
+
+
+##################
+# RESPONSE CACHE #
+##################
+
+class CacheEntry(object):
+    """One cached page body plus its bookkeeping and validators. parsed holds
+    structures extracted from body, so they live and die with it."""
+
+    __slots__ = ('body', 'fetched', 'expires', 'size', 'etag', 'lastmodified', 'parsed')
+
+    def __init__(self, body, ttl, etag=None, lastmodified=None):
+        self.body = body
+        self.fetched = time.time()
+        self.expires = self.fetched + ttl
+        self.size = len(body)
+        self.etag = etag
+        self.lastmodified = lastmodified
+        self.parsed = {}  # (extractor, version) -> result.
+
+    def validators(self):
+        """Return the conditional GET headers for revalidating this entry."""
+
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.lastmodified:
+            headers['If-Modified-Since'] = self.lastmodified
+        return headers
+
+    def fresh(self, now=None):
+        """Is this entry still inside its TTL?"""
+
+        return (now or time.time()) < self.expires
+
+    def usable(self, maxstale, now=None):
+        """Is this entry fresh, or expired by no more than maxstale seconds?"""
+
+        return (now or time.time()) < self.expires + maxstale
+
+
+class ResponseCache(object):
+    """Thread-safe in-memory page cache. Entries expire by TTL and the
+    least recently used ones are evicted once maxbytes is exceeded."""
+
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self._entries = collections.OrderedDict()  # oldest use first.
+        self._size = 0
+        self._lock = threading.Lock()
+        self.counters = collections.Counter()  # hit/miss/notmodified/stale/parsed.
+
+    def count(self, name):
+        """Bump one of the cache counters."""
+
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, key):
+        """Return the entry for key (fresh or not) and mark it as recently used."""
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:  # re-insert at the end (most recent).
+                self._entries[key] = entry
+            return entry
+
+    def put(self, key, body, ttl, etag=None, lastmodified=None):
+        """Store body for key with ttl seconds of freshness. Returns the entry."""
+
+        entry = CacheEntry(body, ttl, etag, lastmodified)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= old.size
+            if entry.size > self.maxbytes:  # never going to fit.
+                return entry
+            self._entries[key] = entry
+            self._size += entry.size
+            self._evict()
+        return entry
+
+    def revalidated(self, key, entry, ttl):
+        """Upstream said entry is unchanged (304). Give it a new ttl in place,
+        so the body (and anything hung off the entry) is reused as-is."""
+
+        with self._lock:
+            entry.fetched = time.time()
+            entry.expires = entry.fetched + ttl
+            if key not in self._entries and entry.size <= self.maxbytes:  # evicted meanwhile.
+                self._entries[key] = entry
+                self._size += entry.size
+                self._evict()
+        return entry
+
+    def _evict(self):
+        """Drop expired entries, then LRU ones, until we're under maxbytes. Hold the lock."""
+
+        if self._size <= self.maxbytes:
+            return
+        now = time.time()
+        for key, entry in self._entries.items():  # expired ones go first.
+            if not entry.fresh(now):
+                del self._entries[key]
+                self._size -= entry.size
+        while self._size > self.maxbytes and self._entries:
+            key, entry = self._entries.popitem(last=False)
+            self._size -= entry.size
+
+    def clear(self):
+        """Empty the cache and reset counters."""
+
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+            self.counters.clear()
+
+    def stats(self):
+        """Return (number of entries, bytes used)."""
+
+        with self._lock:
+            return (len(self._entries), self._size)
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab textwidth=250:
@@ -0,0 +1,942 @@
+# -*- coding: utf-8 -*-
+###
+# Copyright (c) 2012-2014, spline
+# All rights reserved.
+###
+# HTML parsing backends shared by the plugin. No supybot imports in here.
+# parse() hands back a BeautifulSoup 3 tree, or (backend 'lxml') the same API
+# built on lxml's C parser: find, findAll, findParent, findNext, findPrevious,
+# getText, renderContents, extract, tag['attr'], tag.get and tag.child.
+# TableStream pulls the rows of one table off a page without parsing the rest,
+# and TableSpec turns them into tuples of the columns a command declares.
+# jsonhead decodes just the leading items of a JSON feed. TreeLimit caps how
+# many threads hold parse trees and decompose()s them when the thread is done.
+# unescape cleans up entities left in extracted text.
+import collections
+import htmlentitydefs
+import json
+import re
+import threading
+import time
+from BeautifulSoup import BeautifulSoup, SoupStrainer
+try:  # optional. without it everything goes through BeautifulSoup.
+    from lxml import etree
+    import lxml.html
+except ImportError:
+    etree = None
+
+BACKENDS = ('lxml', 'bs3')
+
+# same rules BeautifulSoup 3 uses so both backends render and strip alike.
+_SELF_CLOSING = frozenset(('br', 'hr', 'input', 'img', 'meta', 'spacer', 'link', 'frame', 'base', 'col'))
+_PRESERVE_WHITESPACE = frozenset(('pre', 'textarea'))
+_ASCII_SPACES = dict([(ord(c), None) for c in u'\t\n\f\r '])
+_BARE_AMPERSAND_OR_BRACKET = re.compile(r"([<>]|&(?!#\d+;|#x[0-9a-fA-F]+;|\w+;))")
+_ENTITIES = {'<': '&lt;', '>': '&gt;', '&': '&amp;'}
+
+
+def _escape(s):
+    """Escape brackets and bare ampersands like BeautifulSoup does on output."""
+
+    return _BARE_AMPERSAND_OR_BRACKET.sub(lambda m: _ENTITIES[m.group(0)], s)
+
+
+###############
+# LXML SHIM   #
+###############
+
+class PageElement(object):
+    """Navigation shared by tags and strings. Positions index into the
+    document's node list (document order, like BeautifulSoup's next/previous)."""
+
+    def _document(self):
+        node = self
+        while node.parent is not None:
+            node = node.parent
+        return node
+
+    def _search(self, nodes, name, attrs, text, limit, kwargs):
+        """Return nodes matching the BeautifulSoup-style criteria."""
+
+        strainer = SoupStrainer(name, attrs, text, **kwargs)
+        quickname = name if isinstance(name, basestring) and text is None else None
+        results = []
+        for node in nodes:
+            if isinstance(node, Tag):
+                if quickname and node.name != quickname:  # cheap reject before attrs.
+                    continue
+                if not strainer.text and strainer.searchTag(node.name, node.attrs):
+                    results.append(node)
+            elif strainer.search(node):
+                results.append(node)
+            if limit and len(results) >= limit:
+                break
+        return results
+
+    def _parents(self):
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def findParent(self, name=None, attrs={}, **kwargs):
+        """First ancestor matching name/attrs, or None."""
+
+        r = self._search(self._parents(), name, attrs, None, 1, kwargs)
+        return r[0] if r else None
+
+    def findParents(self, name=None, attrs={}, limit=None, **kwargs):
+        """Ancestors matching name/attrs, nearest first."""
+
+        return self._search(self._parents(), name, attrs, None, limit, kwargs)
+
+    def findNext(self, name=None, attrs={}, text=None, **kwargs):
+        """First node after this one in the document (children first) that matches."""
+
+        r = self.findAllNext(name, attrs, text, 1, **kwargs)
+        return r[0] if r else None
+
+    def findAllNext(self, name=None, attrs={}, text=None, limit=None, **kwargs):
+        """Nodes after this one in the document that match."""
+
+        order = self._document().order
+        return self._search(order[self._i + 1:], name, attrs, text, limit, kwargs)
+
+    def findPrevious(self, name=None, attrs={}, text=None, **kwargs):
+        """First node before this one in the document (ancestors included) that matches."""
+
+        r = self.findAllPrevious(name, attrs, text, 1, **kwargs)
+        return r[0] if r else None
+
+    def findAllPrevious(self, name=None, attrs={}, text=None, limit=None, **kwargs):
+        """Nodes before this one in the document, nearest first, that match."""
+
+        order = self._document().order
+        return self._search(order[1:self._i][::-1], name, attrs, text, limit, kwargs)
+
+    def extract(self):
+        """Remove this node (and its subtree) from the tree. Returns self."""
+
+        document = self._document()
+        if self.parent is not None:
+            contents = self.parent.contents
+            del contents[[i for (i, c) in enumerate(contents) if c is self][0]]  # by identity. strings compare by value.
+            self.parent = None
+            document.reindex()
+        return self
+
+    def decompose(self):
+        """Remove this node and break every link in its subtree, so it is freed
+        right away instead of whenever the cycle collector gets to it."""
+
+        self.extract()
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node.parent = None
+            if isinstance(node, Tag):
+                stack.extend(node.contents)
+                node.contents = []
+        if isinstance(self, Document):
+            self.order = []
+
+
+class NavigableString(unicode, PageElement):
+    """A run of text in the tree."""
+
+    def __new__(cls, value, parent=None):
+        s = unicode.__new__(cls, value)
+        s.parent = parent
+        s._i = 0
+        return s
+
+    @property
+    def string(self):
+        return self
+
+    def _markup(self):
+        return _escape(self)
+
+    def __str__(self, encoding='utf-8'):
+        data = self._markup()
+        return data.encode(encoding) if encoding else data
+
+
+class Comment(NavigableString):
+    """An HTML comment. BeautifulSoup counts these as text too."""
+
+    def _markup(self):
+        return u"<!--%s-->" % _escape(self)
+
+
+class Declaration(NavigableString):
+    """The doctype. Also text as far as BeautifulSoup is concerned."""
+
+    def _markup(self):
+        return u"<!%s>" % _escape(self)
+
+
+class Tag(PageElement):
+    """An element. attrs is a list of (name, value) like BeautifulSoup's."""
+
+    hidden = False
+
+    def __init__(self, name, attrs=None, parent=None):
+        self.name = name
+        self.attrs = attrs or []
+        self.parent = parent
+        self.contents = []
+        self._i = 0
+        self._end = 0
+
+    def _descendants(self):
+        return self._document().order[self._i + 1:self._end]
+
+    def find(self, name=None, attrs={}, recursive=True, text=None, **kwargs):
+        """First descendant matching name/attrs (or text), or None."""
+
+        r = self.findAll(name, attrs, recursive, text, 1, **kwargs)
+        return r[0] if r else None
+
+    def findAll(self, name=None, attrs={}, recursive=True, text=None, limit=None, **kwargs):
+        """Descendants (children only if recursive is False) matching name/attrs,
+        or the strings matching text."""
+
+        nodes = self._descendants() if recursive else self.contents
+        return self._search(nodes, name, attrs, text, limit, kwargs)
+
+    __call__ = findAll
+
+    def getText(self, separator=u""):
+        """Every string under this tag, each stripped, joined by separator."""
+
+        return separator.join([node.strip() for node in self._descendants() if isinstance(node, NavigableString)])
+
+    text = property(getText)
+
+    @property
+    def string(self):
+        if len(self.contents) == 1:
+            child = self.contents[0]
+            return child if isinstance(child, NavigableString) else child.string
+        return None
+
+    def get(self, key, default=None):
+        for (k, v) in self.attrs:
+            if k == key:
+                return v
+        return default
+
+    def has_key(self, key):
+        return self.get(key) is not None
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __getattr__(self, name):
+        """tag.td is tag.find('td'), as in BeautifulSoup."""
+
+        if name.startswith('__'):
+            raise AttributeError(name)
+        if len(name) > 3 and name.endswith('Tag'):
+            return self.find(name[:-3])
+        return self.find(name)
+
+    def __iter__(self):
+        return iter(self.contents)
+
+    def __len__(self):
+        return len(self.contents)
+
+    def __nonzero__(self):
+        return True
+
+    def __contains__(self, x):
+        return x in self.contents
+
+    def _markup(self):
+        contents = u''.join([c._markup() for c in self.contents])
+        if self.hidden:
+            return contents
+        attrs = []
+        for (key, val) in self.attrs:
+            fmt = u'%s="%s"'
+            if u'"' in val:
+                fmt = u"%s='%s'"
+                if u"'" in val:
+                    val = val.replace(u"'", u"&squot;")
+            attrs.append(fmt % (key, _escape(val)))
+        attrs = u' ' + u' '.join(attrs) if attrs else u''
+        if self.name in _SELF_CLOSING:
+            return u'<%s%s />%s' % (self.name, attrs, contents)
+        return u'<%s%s>%s</%s>' % (self.name, attrs, contents, self.name)
+
+    def renderContents(self, encoding='utf-8'):
+        """This tag's children as markup."""
+
+        contents = u''.join([c._markup() for c in self.contents])
+        return contents.encode(encoding) if encoding else contents
+
+    def __str__(self, encoding='utf-8'):
+        data = self._markup()
+        return data.encode(encoding) if encoding else data
+
+    def __unicode__(self):
+        return self.__str__(None)
+
+    def __repr__(self):
+        return self.__str__()
+
+
+class Document(Tag):
+    """Root of an lxml-built tree. Keeps every node in document order."""
+
+    hidden = True
+
+    def __init__(self):
+        Tag.__init__(self, '[document]')
+        self.order = []
+
+    def reindex(self):
+        """Renumber nodes in document order. Run after the tree changes."""
+
+        order, ends = [], []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node is None:  # marker: the tag on top of 'ends' just closed.
+                ends.pop()._end = len(order)
+                continue
+            node._i = len(order)
+            order.append(node)
+            if isinstance(node, Tag):
+                ends.append(node)
+                stack.append(None)
+                stack.extend(reversed(node.contents))
+        self.order = order
+
+
+def _addtext(parent, data, preserve):
+    """Append a string to parent, collapsing whitespace-only runs like BeautifulSoup."""
+
+    data = unicode(data)
+    if not preserve and not data.translate(_ASCII_SPACES):
+        data = u'\n' if u'\n' in data else u' '
+    parent.contents.append(NavigableString(data, parent))
+
+
+def _build(el, parent, preserve=False):
+    """Copy lxml element el and its subtree (not its tail) under parent."""
+
+    tag = Tag(el.tag, [(unicode(k), unicode(v)) for (k, v) in el.items()], parent)
+    parent.contents.append(tag)
+    preserve = preserve or tag.name in _PRESERVE_WHITESPACE
+    if el.text:
+        _addtext(tag, el.text, preserve)
+    for child in el:
+        if isinstance(child.tag, basestring):
+            _build(child, tag, preserve)
+        elif child.tag is etree.Comment:
+            tag.contents.append(Comment(unicode(child.text or u''), tag))
+        if child.tail:
+            _addtext(tag, child.tail, preserve)
+
+
+def _matching(root, strainers):
+    """Outermost elements under root matching any strainer, in document order."""
+
+    found, stack = [], [root]
+    while stack:
+        el = stack.pop()
+        if not isinstance(el.tag, basestring):
+            continue
+        if [s for s in strainers if s.searchTag(el.tag, el.items())]:
+            found.append(el)
+            continue
+        stack.extend(reversed(el))
+    return found
+
+
+def _decode(html, fromEncoding=None):
+    """Return html as unicode."""
+
+    if isinstance(html, unicode):
+        return html
+    try:
+        return html.decode(fromEncoding or 'utf-8')
+    except (UnicodeDecodeError, LookupError):
+        return html.decode('windows-1252', 'replace')
+
+
+def _lxmlparse(html, targets, convertEntities, fromEncoding):
+    """Parse with lxml and build the shim tree (just the targets' subtrees if they're all there)."""
+
+    text = _decode(html, fromEncoding)
+    if not convertEntities:  # keep entities as literal text, as BeautifulSoup does without convertEntities.
+        text = text.replace(u'&', u'&amp;')
+    document = Document()
+    try:  # hand lxml utf-8 and say so, so xml declarations and meta charsets can't confuse it.
+        root = lxml.html.document_fromstring(text.encode('utf-8'), parser=lxml.html.HTMLParser(encoding='utf-8'))
+    except (etree.ParserError, ValueError):  # empty or unparseable document.
+        document.reindex()
+        return document
+    if targets:
+        strainers = [SoupStrainer(name, attrs or {}) for (name, attrs) in targets]
+        for el in _matching(root, strainers):
+            _build(el, document)
+        document.reindex()
+        if not [name for (name, attrs) in targets if not document.find(name, attrs or {})]:
+            return document
+        document = Document()  # a target is missing. build the whole page.
+    doctype = root.getroottree().docinfo.doctype
+    if doctype:
+        document.contents.append(Declaration(doctype[2:-1], document))
+    _build(root, document)
+    document.reindex()
+    return document
+
+
+def _bs3parse(html, targets, convertEntities, fromEncoding):
+    """Parse with BeautifulSoup 3, through a SoupStrainer if we have targets."""
+
+    kwargs = {'convertEntities': convertEntities}
+    if fromEncoding:
+        kwargs['fromEncoding'] = fromEncoding
+    if targets:
+        strainers = [SoupStrainer(name, attrs or {}) for (name, attrs) in targets]
+        only = SoupStrainer(lambda name, attrs: [s for s in strainers if s.searchTag(name, attrs)])
+        soup = BeautifulSoup(html, parseOnlyThese=only, **kwargs)
+        if not [name for (name, attrs) in targets if not soup.find(name, attrs or {})]:
+            return soup
+    return BeautifulSoup(html, **kwargs)
+
+
+def parse(html, backend='lxml', targets=(), convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding=None):
+    """Parse html into a BeautifulSoup-style tree using backend ('lxml' or 'bs3').
+    lxml falls back to bs3 when it isn't installed. targets are the (tag, attrs)
+    of the elements the caller reads: only their subtrees get built, unless one
+    is missing, in which case the whole page is."""
+
+    if backend == 'lxml' and etree is not None:
+        return _lxmlparse(html, targets, convertEntities, fromEncoding)
+    return _bs3parse(html, targets, convertEntities, fromEncoding)
+
+
+##############
+# TREE LIMIT #
+##############
+
+class TreeLimit(object):
+    """Caps how many threads hold parse trees at once. A thread opens a scope with
+    enter(), takes a slot with acquire() before its first parse and registers
+    each tree it builds with hold(). exit() decompose()s those trees and frees
+    the slot. Scopes nest (a command run inside another on the same thread):
+    only the outermost exit() tears down and frees. Outside a scope acquire()
+    and hold() do nothing. limit can be changed at any time."""
+
+    def __init__(self, limit=4):
+        self.limit = limit
+        self._busy = 0  # threads holding a slot.
+        self._cond = threading.Condition()
+        self._local = threading.local()
+
+    def enter(self):
+        depth = getattr(self._local, 'depth', 0)
+        if not depth:
+            self._local.trees = []
+            self._local.slot = False
+        self._local.depth = depth + 1
+
+    def acquire(self, timeout=None):
+        """Take a slot for the calling thread unless it has one. Returns False if
+        none came up within timeout seconds (None waits as long as it takes)."""
+
+        if getattr(self._local, 'trees', None) is None or self._local.slot:
+            return True
+        deadline = time.time() + timeout if timeout is not None else None
+        with self._cond:
+            while self._busy >= self.limit:
+                wait = deadline - time.time() if deadline is not None else None
+                if wait is not None and wait <= 0:
+                    return False
+                self._cond.wait(wait)
+            self._busy += 1
+        self._local.slot = True
+        return True
+
+    def hold(self, tree):
+        """Tear tree down at exit(). Returns tree."""
+
+        trees = getattr(self._local, 'trees', None)
+        if trees is not None:
+            trees.append(tree)
+        return tree
+
+    def exit(self):
+        self._local.depth = getattr(self._local, 'depth', 1) - 1
+        if self._local.depth > 0:  # an enclosing scope is still open. it tears down.
+            return
+        trees = getattr(self._local, 'trees', None) or []
+        self._local.trees = None
+        while trees:
+            trees.pop().decompose()
+        if getattr(self._local, 'slot', False):
+            self._local.slot = False
+            with self._cond:
+                self._busy -= 1
+                self._cond.notify()
+
+    def busy(self):
+        """Threads holding a slot right now."""
+
+        with self._cond:
+            return self._busy
+
+
+############
+# ENTITIES #
+############
+
+_ENTITYREF = re.compile(r'&(?:#([0-9]+)|#[xX]([0-9a-fA-F]+)|([A-Za-z][A-Za-z0-9]*));')
+
+
+def _entity(m):
+    (dec, hexa, name) = m.groups()
+    try:
+        if name:
+            return unichr(htmlentitydefs.name2codepoint[name])
+        return unichr(int(dec) if dec else int(hexa, 16))
+    except (KeyError, ValueError, OverflowError):  # not one we know. leave it.
+        return m.group(0)
+
+
+class EntityDecoder(object):
+    """Decodes the entity and character references left in extracted text and makes
+    non-breaking spaces plain ones. BeautifulSoup 3 turns a bare & into '&amp;' and
+    leaves hex references alone, so its text needs this and lxml's doesn't, but both
+    go through it to come out the same. Text repeats a lot, so results are memoised
+    (up to maxcache)."""
+
+    def __init__(self, maxcache=4096):
+        self.maxcache = maxcache
+        self._cache = {}
+
+    def __call__(self, text):
+        if u'&' not in text and u'\xa0' not in text:  # most text.
+            return text
+        try:
+            return self._cache[text]
+        except KeyError:
+            pass
+        plain = _ENTITYREF.sub(_entity, text).replace(u'\xa0', u' ')
+        if len(self._cache) >= self.maxcache:
+            self._cache.clear()
+        self._cache[text] = plain
+        return plain
+
+unescape = EntityDecoder()
+
+
+####################
+# STREAMING TABLES #
+####################
+
+def _find(elements, name, attrs):
+    """First of elements (Cells) matching name/attrs, or None."""
+
+    strainer = SoupStrainer(name, attrs)
+    for element in elements:
+        if strainer.searchTag(element.name, element.attrs):
+            return element
+    return None
+
+
+class Cell(unicode):
+    """Text of an element in a streamed row (its strings, each stripped, joined
+    like getText()) with its tag name, attrs (a dict) and the elements inside
+    it as Cells (in document order) for find()."""
+
+    def __new__(cls, text, name, attrs, elements=()):
+        cell = unicode.__new__(cls, text)
+        cell.name = name
+        cell.attrs = attrs
+        cell.elements = elements
+        return cell
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def find(self, name=None, attrs={}):
+        """First element in the cell matching name/attrs, or None."""
+
+        return _find(self.elements, name, attrs)
+
+
+class Row(list):
+    """A streamed table row: the Cells of its td/th, its attrs, the section it
+    sits in (thead, tbody, tfoot or table) and every element inside it as a
+    Cell (elements, in document order) for find()."""
+
+    def __init__(self, cells, attrs, section, elements):
+        list.__init__(self, cells)
+        self.attrs = attrs
+        self.section = section
+        self.elements = elements
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def find(self, name=None, attrs={}):
+        """First element in the row matching name/attrs, or None."""
+
+        return _find(self.elements, name, attrs)
+
+
+def _row(children, attrs, section):
+    """Row from the Cells for a tr's children."""
+
+    elements = []
+    for child in children:
+        elements.append(child)
+        elements.extend(child.elements)
+    return Row([child for child in children if child.name in ('td', 'th')], attrs, section, elements)
+
+
+def _strings(el):
+    """Strings under lxml element el (comments included, its tail not) in document order."""
+
+    if el.text:
+        yield el.text
+    for child in el:
+        for text in _strings(child):
+            yield text
+        if child.tail:
+            yield child.tail
+
+
+def _celltext(el):
+    return unescape(u''.join([unicode(text).strip() for text in _strings(el)]))
+
+
+class TableStream(object):
+    """Reads one table off a page without building the page. The target is the
+    table that is, or holds, the first element matching table (a (name, attrs)
+    pair), inside an element matching within if that's given. grab maps keys to
+    (name, attrs[, within]) of other elements whose text we want; the first match
+    of each lands in grabbed as a Cell.
+
+    With lxml, rows() feeds the page to a pull parser a chunk at a time and yields
+    each Row of the target as it closes. Once the table has closed (and every grab
+    has turned up) it stops, so the rest of the page is never tokenized. Anything
+    else goes through a BeautifulSoup 3 parse and yields the same rows."""
+
+    def __init__(self, table, within=None, grab=None, backend='lxml'):
+        self.table = table
+        self.within = within
+        self.grab = grab or {}
+        self.backend = backend
+        self.found = False  # did we see the target table?
+        self.grabbed = {}
+
+    def rows(self, html, fromEncoding=None, chunksize=16384):
+        """Yield the target table's rows (Row) from html."""
+
+        if self.backend == 'lxml' and etree is not None:
+            return self._pullrows(_decode(html, fromEncoding).encode('utf-8'), chunksize)
+        return self._bs3rows(html, fromEncoding)
+
+    def _bs3rows(self, html, fromEncoding):
+        if self.within or self.table[0] == 'table':  # just build what we read (see parse).
+            targets = [self.within or self.table] + [spec[2] if len(spec) > 2 else spec[:2] for spec in self.grab.values()]
+        else:  # the table is found from inside. build it all.
+            targets = ()
+        soup = _bs3parse(html, targets, BeautifulSoup.HTML_ENTITIES, fromEncoding)
+        for (key, spec) in self.grab.items():
+            scope = soup.find(*spec[2]) if len(spec) > 2 else soup
+            el = scope.find(spec[0], spec[1]) if scope else None
+            if el:
+                self.grabbed[key] = Cell(unescape(el.getText()), el.name, dict(el.attrs))
+        scope = soup.find(*self.within) if self.within else soup
+        el = scope.find(*self.table) if scope else None
+        table = el if not el or el.name == 'table' else el.findParent('table')
+        if not table:
+            soup.decompose()
+            return
+        self.found = True
+        try:
+            for tr in table.findAll('tr'):
+                if tr.findParent('table') is not table:  # a nested table's row.
+                    continue
+                children = [Cell(unescape(el.getText()), el.name, dict(el.attrs), [Cell(unescape(d.getText()), d.name, dict(d.attrs)) for d in el.findAll(True)])\
+                    for el in tr.findAll(True, recursive=False)]
+                yield _row(children, dict(tr.attrs), tr.parent.name)
+        finally:  # rows are plain Cells. nothing points back into the soup.
+            soup.decompose()
+
+    def _row(self, tr):
+        children = [Cell(_celltext(el), el.tag, dict(el.attrib), [Cell(_celltext(d), d.tag, dict(d.attrib)) for d in el.iterdescendants() if isinstance(d.tag, basestring)])\
+            for el in tr if isinstance(el.tag, basestring)]
+        return _row(children, dict(tr.attrib), tr.getparent().tag)
+
+    def _pullrows(self, data, chunksize):
+        table = SoupStrainer(*self.table)
+        within = SoupStrainer(*self.within) if self.within else None
+        grabs = [(key, SoupStrainer(spec[0], spec[1]), SoupStrainer(*spec[2]) if len(spec) > 2 else None) for (key, spec) in self.grab.items()]
+        scopes = {}  # strainer -> open elements matching it.
+        pending = {}  # open grab element -> key.
+        ended = []  # rows closed before we knew the target.
+        target, closed, depth = None, False, 0  # depth: open tables.
+        parser = etree.HTMLPullParser(events=('start', 'end'), encoding='utf-8')
+        for i in xrange(0, len(data), chunksize):
+            parser.feed(data[i:i + chunksize])
+            if i + chunksize >= len(data):  # last chunk.
+                try:
+                    parser.close()
+                except etree.XMLSyntaxError:  # nothing parseable.
+                    pass
+            for (event, el) in parser.read_events():
+                if not isinstance(el.tag, basestring):  # comment.
+                    continue
+                if event == 'start':
+                    items = el.items()
+                    for strainer in (within,) + tuple([g[2] for g in grabs]):
+                        if strainer and strainer.searchTag(el.tag, items):
+                            scopes.setdefault(strainer, []).append(el)
+                    if el.tag == 'table':
+                        depth += 1
+                    for (key, strainer, scope) in grabs:
+                        if key not in self.grabbed and key not in pending.values() and strainer.searchTag(el.tag, items) and (not scope or scopes.get(scope)):
+                            pending[el] = key
+                    if target is None and (not within or scopes.get(within)) and table.searchTag(el.tag, items):
+                        target = el if el.tag == 'table' else next(el.iterancestors('table'), None)
+                        if target is not None:  # rows of it that closed before el.
+                            self.found = True
+                            for tr in ended:
+                                if next(tr.iterancestors('table')) is target:
+                                    yield self._row(tr)
+                            ended = []
+                    continue
+                # end of el.
+                for strainer in scopes:
+                    if scopes[strainer] and scopes[strainer][-1] is el:
+                        scopes[strainer].pop()
+                if el in pending:
+                    key = pending.pop(el)
+                    self.grabbed[key] = Cell(_celltext(el), el.tag, dict(el.attrib))
+                if el.tag == 'tr' and target is None:  # might be the target's, we'll know later.
+                    ended.append(el)
+                elif el.tag == 'tr' and not closed and next(el.iterancestors('table'), None) is target:
+                    yield self._row(el)
+                    el.clear()
+                elif el.tag == 'table':
+                    depth -= 1
+                    if el is target:
+                        closed = True
+                if not depth and not pending:  # done with it. keep the tree small.
+                    ended = []
+                    el.clear()
+                    while el.getprevious() is not None:
+                        del el.getparent()[0]
+            if closed and len(self.grabbed) == len(grabs):
+                return
+
+
+###############
+# STAT LABELS #
+###############
+
+class LabelNormalizer(object):
+    """Shortens labels using a mapping of long -> short in a single pass. The names
+    go into one regex alternation, longest first, so a name wins over any shorter
+    name inside it. Labels repeat a lot, so results are memoised (up to maxcache)."""
+
+    def __init__(self, mapping, maxcache=1024):
+        self.mapping = dict(mapping)
+        self.maxcache = maxcache
+        names = sorted(self.mapping, key=lambda name: (-len(name), name))
+        self._regex = re.compile('|'.join([re.escape(name) for name in names]))
+        self._cache = {}
+
+    def __call__(self, label):
+        try:
+            return self._cache[label]
+        except KeyError:
+            pass
+        short = self._regex.sub(lambda m: self.mapping[m.group(0)], label)
+        if len(self._cache) >= self.maxcache:  # odd labels. start over.
+            self._cache.clear()
+        self._cache[label] = short
+        return short
+
+
+##############
+# JSON FEEDS #
+##############
+
+_JSONSPACE = re.compile(r'[ \t\n\r]*')
+
+
+def jsonhead(text, count, key=None):
+    """The first count items of the JSON array in text, or of the array under key
+    if text is a JSON object, decoding nothing past them. Raises ValueError if
+    text isn't shaped like that."""
+
+    decoder = json.JSONDecoder()
+    i = _JSONSPACE.match(text).end()
+    if key is not None:  # walk the object's members to key.
+        if text[i:i + 1] != '{':
+            raise ValueError("Expected an object at {0}".format(i))
+        i = _JSONSPACE.match(text, i + 1).end()
+        while True:
+            if text[i:i + 1] != '"':
+                raise ValueError("No {0!r} in the object".format(key))
+            (name, i) = decoder.raw_decode(text, i)
+            i = _JSONSPACE.match(text, i).end()
+            if text[i:i + 1] != ':':
+                raise ValueError("Expected : at {0}".format(i))
+            i = _JSONSPACE.match(text, i + 1).end()
+            if name == key:
+                break
+            (value, i) = decoder.raw_decode(text, i)  # not it. step over the value.
+            i = _JSONSPACE.match(text, i).end()
+            if text[i:i + 1] != ',':
+                raise ValueError("No {0!r} in the object".format(key))
+            i = _JSONSPACE.match(text, i + 1).end()
+    if text[i:i + 1] != '[':
+        raise ValueError("Expected an array at {0}".format(i))
+    i = _JSONSPACE.match(text, i + 1).end()
+    items = []
+    while len(items) < count and text[i:i + 1] != ']':
+        (item, i) = decoder.raw_decode(text, i)
+        items.append(item)
+        i = _JSONSPACE.match(text, i).end()
+        if text[i:i + 1] == ',':
+            i = _JSONSPACE.match(text, i + 1).end()
+        elif text[i:i + 1] != ']':
+            raise ValueError("Expected , or ] at {0}".format(i))
+    return items
+
+
+#################
+# TABLE SPECS   #
+#################
+
+class LayoutChanged(Exception):
+    """A page no longer looks like its TableSpec says (a header or a cell that won't convert)."""
+
+    pass
+
+
+class Rows(list):
+    """TableSpec results: one tuple per row. grabbed is the TableStream's grabs,
+    skipped counts rows dropped for having the wrong number of cells."""
+
+    def __init__(self, rows, grabbed, skipped):
+        list.__init__(self, rows)
+        self.grabbed = grabbed
+        self.skipped = skipped
+
+
+class TableSpec(object):
+    """Declares a table once, so a command doesn't walk it by hand. table, within
+    and grab find it as for TableStream. columns is a sequence of (name, column[,
+    convert]): column is a cell index or a header label, and convert is called
+    with the Cell (the default keeps it as is). Labels are looked up in the first
+    row matching header (tr attrs), or the table's first row.
+
+    Rows are kept if they sit in section (thead, tbody, tfoot; any if None),
+    match rows (tr attrs, or a callable taking the Row) and come after the first
+    skip of those. Of those, rows with fewer cells than the columns need (or
+    other than width, if given) are skipped and counted, or raise LayoutChanged
+    if strict. cells names the tags that count as cells. A label that isn't
+    there, or a cell convert can't take, raises LayoutChanged."""
+
+    def __init__(self, table, columns, within=None, grab=None, section=None, rows=None, skip=0, width=None, header=None, cells=('td',), strict=False):
+        self.table = table
+        self.within = within
+        self.grab = grab
+        self.section = section
+        self.skip = skip
+        self.width = width
+        self.cells = cells
+        self.strict = strict
+        self.columns = [(c[0], c[1], c[2] if len(c) > 2 else None) for c in columns]
+        self.tuple = collections.namedtuple('Row', [c[0] for c in self.columns])
+        self.labels = [c[1] for c in self.columns if isinstance(c[1], basestring)]
+        self.header = SoupStrainer('tr', header or {}) if self.labels else None
+        if callable(rows):
+            self.rows = rows
+        else:
+            strainer = SoupStrainer('tr', rows or {})
+            self.rows = lambda row: strainer.searchTag('tr', row.attrs)
+
+    def _indexes(self, row):
+        """Cell index of each column, given the header row."""
+
+        labels = [unicode(cell) for cell in row if cell.name in self.cells]
+        indexes = []
+        for (name, column, convert) in self.columns:
+            if isinstance(column, basestring):
+                if column not in labels:
+                    raise LayoutChanged("Column '{0}' is gone from {1}.".format(column, self._where()))
+                column = labels.index(column)
+            indexes.append(column)
+        return indexes
+
+    def _where(self):
+        (name, attrs) = self.table
+        return "<{0}>".format(" ".join([name] + ["{0}={1}".format(k, getattr(v, 'pattern', v)) for (k, v) in sorted((attrs or {}).items())]))
+
+    def extract(self, html, backend='lxml', fromEncoding=None):
+        """Rows of the table in html, as tuples of the columns, in one pass. None if
+        the table isn't there."""
+
+        stream = TableStream(self.table, self.within, self.grab, backend)
+        indexes = None if self.labels else [c[1] for c in self.columns]
+        need = max(indexes) + 1 if indexes else 0
+        out, skipped, seen = [], 0, 0
+        for row in stream.rows(html, fromEncoding):
+            if indexes is None:  # header first.
+                if self.header.searchTag('tr', row.attrs):
+                    indexes = self._indexes(row)
+                    need = max(indexes) + 1
+                continue
+            if (self.section and row.section != self.section) or not self.rows(row):
+                continue
+            seen += 1
+            if seen <= self.skip:
+                continue
+            cells = [cell for cell in row if cell.name in self.cells]
+            if len(cells) < need or (self.width and len(cells) != self.width):
+                if self.strict:
+                    raise LayoutChanged("A row in {0} has {1} cells, not {2}.".format(self._where(), len(cells), self.width or need))
+                skipped += 1
+                continue
+            values = []
+            for ((name, column, convert), i) in zip(self.columns, indexes):
+                if not convert:
+                    values.append(cells[i])
+                    continue
+                try:
+                    values.append(convert(cells[i]))
+                except (ValueError, TypeError, AttributeError, IndexError, KeyError), e:
+                    raise LayoutChanged("Can't read {0} from '{1}' in {2} ({3}).".format(name, cells[i], self._where(), e))
+            out.append(self.tuple(*values))
+        if not stream.found:
+            return None
+        if indexes is None:
+            raise LayoutChanged("{0} has no header row.".format(self._where()))
+        return Rows(out, stream.grabbed, skipped)
+
+    def columnar(self, html, backend='lxml', fromEncoding=None):
+        """Like extract, but as an OrderedDict of column name -> list of values."""
+
+        rows = self.extract(html, backend, fromEncoding)
+        if rows is None:
+            return None
+        return collections.OrderedDict([(name, [row[i] for row in rows]) for (i, name) in enumerate(self.tuple._fields)])
+
+# vim:set shiftwidth=4 softtabstop=4 expandtab textwidth=250:
@@ -4,19 +4,23 @@
 # All rights reserved.
 ###
 # my libs.
-from BeautifulSoup import BeautifulSoup
 from base64 import b64decode
 import re
 import collections
 from itertools import groupby, count
 from operator import itemgetter
 import datetime
+import hashlib  # feed digests.
 import json
-import sqlite3  # db.
 import os.path  # db.
+import threading  # background refresh.
+import time  # command budgets.
 import unicodedata
 import jellyfish  # matching.
 from metaphone import doublemetaphone  # matching.
+import fetch  # page cache and http pool.
+import parsers  # html parsing backends.
+import teams  # team table.
 # supybot libs
 import supybot.utils as utils
 from supybot.commands import *
@@ -34,15 +38,62 @@ class NFL(callbacks.Plugin):
         self.__parent = super(NFL, self)
         self.__parent.__init__(irc)
         self._nfldb = os.path.abspath(os.path.dirname(__file__)) + '/db/nfl.db'
+        self._dbs = teams.DbConnections()  # read-only, one per db. used by the reloaders below.
         self._playersdb = os.path.abspath(os.path.dirname(__file__)) + '/db/nfl_players.db'
+        # both dbs are served from memory and rebuilt when playerdb.py (or anything) changes them.
+        self._teams = teams.Reloader(self._nfldb, lambda path: teams.TeamRegistry(path, self._dbconnect),\
+            self.registryValue('dbCheckInterval'), self.log)
+        self._players = teams.Reloader(self._playersdb, lambda path: teams.PlayerIndex(path, self._dbconnect),\
+            self.registryValue('dbCheckInterval'), self.log)
+        self._cache = fetch.ResponseCache(self.registryValue('cacheMaxBytes'))
+        self._guards = fetch.HostGuards(self.registryValue('httpRatePerHost'), self.registryValue('httpBurstPerHost'),\
+            self.registryValue('httpBreakerThreshold'), self.registryValue('httpBreakerCooldown'))
+        self._pool = fetch.ConnectionPool(self.registryValue('httpMaxConnsPerHost'),\
+            self.registryValue('httpIdleTimeout'), self.registryValue('httpTimeout'), self._guards)
+        self._flights = fetch.SingleFlight()
+        self._overruns = collections.Counter()  # command -> times it blew its budget.
+        self._feeds = collections.OrderedDict()  # url -> (digest, key, count asked for, items) of json feeds, oldest first.
+        self._feedslock = threading.Lock()
+        self._trees = parsers.TreeLimit(self.registryValue('parserMaxTrees'))
 
     def die(self):
+        self._cache.clear()
+        self._pool.closeall()
+        self._dbs.closeall()
         self.__parent.die()
 
     ##############
     # FORMATTING #
     ##############
 
+    def callCommand(self, command, irc, msg, *args, **kwargs):
+        """Run every command on a time budget (commandBudget). Fetches and parse waits
+        made while it runs are cut off once it is spent, so a hung upstream gets a
+        short reply instead of tying up the thread. Overruns are counted per command.
+        Pages it parses are torn down when it returns (see _soup)."""
+
+        budget = self.registryValue('commandBudget')
+        name = ' '.join(command)
+        enclosing = fetch.setdeadline(budget)  # a nested command's enclosing one gets its deadline back after.
+        self._trees.limit = self.registryValue('parserMaxTrees')
+        self._teams.interval = self._players.interval = self.registryValue('dbCheckInterval')
+        self._trees.enter()
+        start = time.time()
+        try:
+            self.__parent.callCommand(command, irc, msg, *args, **kwargs)
+        except fetch.DeadlineExceeded:
+            irc.reply("ERROR: Upstream is slow right now. Try again in a bit.")
+        except parsers.LayoutChanged as e:  # a TableSpec no longer fits the page.
+            self.log.error("{0}: {1}".format(name, e))
+            irc.reply("ERROR: {0} The page layout probably changed.".format(e))
+        finally:
+            self._trees.exit()
+            fetch.restoredeadline(enclosing)
+            elapsed = time.time() - start
+            if budget and elapsed > budget:
+                self._overruns[name] += 1
+                self.log.warning("{0} took {1:.1f}s. Budget is {2}s.".format(name, elapsed, budget))
+
     def _red(self, string):
         """Returns a red string."""
         return ircutils.mircColor(string, 'red')
@@ -117,26 +168,215 @@ class NFL(callbacks.Plugin):
         except ValueError:
             return False
 
-    def _httpget(self, url, h=None, d=None, l=True):
-        """General HTTP resource fetcher. Pass headers via h, data via d, and to log via l."""
+    def _httpget(self, url, h=None, d=None, l=True, stop=None):
+        """General HTTP resource fetcher. Pass headers via h, data via d, and to log via l.
+        Pass stop (a marker or a (start, end) marker pair) to quit downloading once
+        everything the command needs has arrived.
+        Plain GETs (no data, no cookie) are served from the page cache while fresh and
+        revalidated with If-None-Match/If-Modified-Since once they expire. Concurrent
+        fetches of the same url share one upstream request."""
+
+        # only cache plain GETs. POSTs and cookie'd requests always go out.
+        cacheable = self.registryValue('cacheEnabled') and not d and not (h and h.get('Cookie'))
+        key, entry, maxstale = self._cachekey(url, stop), None, 0
+        if cacheable:
+            if stop:  # a fresh copy of the whole page does just as well.
+                entry = self._cache.get(url)
+                if entry and entry.fresh():
+                    self._cache.count('hit')
+                    return entry.body
+            entry = self._cache.get(key)
+            if entry and entry.fresh():
+                self._cache.count('hit')
+                return entry.body
+            maxstale = fetch.lookuppolicy(self.registryValue('cacheStaleTTLs'), url, 0)
+
+        if not h:
+            h = {"User-Agent":"Mozilla/5.0 (X11; Ubuntu; Linux i686; rv:17.0) Gecko/20100101 Firefox/17.0"}
+        elif h.get("User-Agent") is None and not d:
+            h["User-Agent"] = "Mozilla/5.0 (Windows NT 6.3; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/33.0.1750.154 Safari/537.36"
+        # pick up any registry changes, then go out over a pooled connection.
+        self._pool.maxperhost = self.registryValue('httpMaxConnsPerHost')
+        self._pool.idletimeout = self.registryValue('httpIdleTimeout')
+        self._guards.rate = max(self.registryValue('httpRatePerHost'), 0.1)
+        self._guards.burst = self.registryValue('httpBurstPerHost')
+        self._guards.threshold = self.registryValue('httpBreakerThreshold')
+        self._guards.cooldown = self.registryValue('httpBreakerCooldown')
+        self._fixtures()
+        if entry and maxstale and entry.usable(maxstale):  # stale-while-revalidate.
+            self._cache.count('stale')
+            if not self._flights.inflight(key):  # one background refresh at a time.
+                refresh = threading.Thread(target=self._httprefresh, args=(key, url, h, entry, l, stop))
+                refresh.daemon = True
+                refresh.start()
+            return entry.body
+        try:
+            if cacheable:  # one upstream fetch per url, no matter how many threads want it.
+                return self._flights.do(key, self._httpfetch, key, url, h, entry, l, stop)
+            if self.registryValue('logURLs') and l:
+                self.log.info(url)
+            return self._pool.get(url, headers=h, data=(d or None), timeout=self.registryValue('httpTimeout'),\
+                maxbytes=self._maxbytes(url), stop=stop).body
+        except (fetch.CircuitOpen, fetch.RateLimited, fetch.DeadlineExceeded) as e:  # host is down, busy or slow. last good copy beats nothing.
+            if entry:
+                self.log.warning("Serving cached copy of {0}: {1}".format(url, e))
+                self._cache.count('fallback')
+                return entry.body
+            if isinstance(e, fetch.DeadlineExceeded):  # out of time. callCommand replies.
+                raise
+            self.log.error("ERROR opening {0} message: {1}".format(url, e))
+            return None
+        except fetch.FetchError as e:
+            self.log.error("ERROR opening {0} message: {1}".format(url, e))
+            return None
+
+    def _fixtures(self):
+        """Point the pool at the fixture archive (or not) per fixtureMode."""
+
+        mode = self.registryValue('fixtureMode')
+        if mode == 'off':
+            self._pool.fixtures = None
+            return
+        path = self.registryValue('fixtureDir') or os.path.abspath(os.path.dirname(__file__)) + '/fixtures'
+        if not self._pool.fixtures or self._pool.fixtures.path != path:
+            self._pool.fixtures = fetch.FixtureArchive(path)
+        self._pool.fixtures.mode = mode
+        self._pool.fixtures.latency = self.registryValue('fixtureLatency') / 1000.0
+
+    def _cachekey(self, url, stop):
+        """Cache key for url. Pages cut short at a stop marker are kept apart from whole ones."""
+
+        if not stop:
+            return url
+        if isinstance(stop, basestring):
+            return "{0}#stop={1}".format(url, stop)
+        return "{0}#stop={1}..{2}".format(url, stop[0], stop[1])
+
+    def _maxbytes(self, url):
+        """Largest body (bytes) we will read from url."""
+
+        return fetch.lookuppolicy(self.registryValue('httpMaxBytesPerSource'), url, self.registryValue('httpMaxBytes'))
+
+    def _httpfetch(self, key, url, h, entry, l, stop):
+        """Fetch url into the page cache under key, revalidating entry if we have one.
+        Runs once per key at a time (see _httpget). Raises fetch.FetchError."""
 
         if self.registryValue('logURLs') and l:
             self.log.info(url)
+        if entry:  # expired entry. ask upstream if it changed.
+            h = dict(h, **entry.validators())
+        response = self._pool.get(url, headers=h, timeout=self.registryValue('httpTimeout'), maxbytes=self._maxbytes(url), stop=stop)
+        if response.truncated:
+            self.log.warning("{0} is over {1} bytes. Only read that much.".format(url, self._maxbytes(url)))
+        # store it with the ttl for this source. ttl of 0 means never cache.
+        ttl = fetch.lookuppolicy(self.registryValue('cacheTTLs'), url, self.registryValue('cacheDefaultTTL'))
+        if response.status == 304 and entry:  # unchanged. reuse what we have.
+            self._cache.count('notmodified')
+            self._cache.revalidated(key, entry, ttl)
+            return entry.body
+        self._cache.count('miss')
+        # a body cut off at maxbytes is not the page. don't let it stand in for one later.
+        if ttl > 0 and response.body and not response.truncated:
+            if not response.stopped:  # never hit the marker so we have the whole page.
+                key = url
+            self._cache.maxbytes = self.registryValue('cacheMaxBytes')
+            self._cache.put(key, response.body, ttl, response.headers.get('etag'), response.headers.get('last-modified'))
+        return response.body
+
+    def _parsed(self, url, html, extract, version):
+        """Return extract(html), reusing the result kept on url's page cache entry
+        if html is that entry's body. Results go away with the page (a 304 keeps
+        them). Bump version when an extractor changes. Callers share results,
+        so don't modify them."""
+
+        entry = self._cache.get(url)
+        if not entry or entry.body is not html:  # not cached, or not this copy of it.
+            return extract(html)
+        key = (extract.__name__, version)
+        if key in entry.parsed:
+            self._cache.count('parsed')
+            return entry.parsed[key]
+        result = entry.parsed[key] = extract(html)
+        return result
+
+    # shortened stat labels for nflgamestats (box score rows), nflgamelog (column groups)
+    # and nflcareerstats (table headings, which become the _postostats categories).
+    _statlabels = parsers.LabelNormalizer({
+        # box score.
+        # 1st Downs: 22 | Passing 1st downs: 12 | Rushing 1st downs: 8 | 1st downs from Penalties: 2 | 3rd down efficiency: 7-17 |
+        # 4th down efficiency: 0-1 | Total Plays: 79 | Total Yards: 407 | Yards per play: 5.2 | Total Drives: 12 | Passing: 280 |
+        # Comp - Att: 25-45 | Yards per pass: 6.2 | Interceptions thrown: 0 | Sacks - Yards Lost: 0-0 | Rushing: 127 | Rushing Attempts: 34 | Yards
+        # per rush: 3.7 | Red Zone (Made-Att): 1-2 | Penalties: 9-84 | Turnovers: 0 | Fumbles lost: 0 | Interceptions thrown: 0 |
+        # Defensive / Special Teams TDs: 0 | Possession: 35:34
+        '1st Downs': '1stD', 'Passing 1st downs': 'Pass', 'Rushing 1st downs': 'Rush', '1st downs from Penalties': 'Pen',
+        '3rd down efficiency': '3rdD EFF', '4th down efficiency': '4thD EFF', 'Total Plays': 'Plys', 'Total Yards': 'YDS',
+        'Yards per play': 'YPP', 'Total Drives': 'Drvs', 'Comp - Att': 'C-A', 'Defensive / Special Teams TDs': 'D/ST TDs',
+        'Yards per pass': 'YPP', 'Interceptions thrown': 'INT', 'Sacks - Yards Lost': 'S-YL', 'Rushing Attempts': 'R-ATT',
+        'Yards per rush': 'YPR', 'Red Zone (Made-Att)': 'RZ (Made-Att)', 'Penalties': 'PEN', 'Turnovers': 'TO',
+        'Fumbles lost': 'Fum lst', 'Possession': 'TOP', 'Passing': 'PASS', 'Rushing': 'RUSH',
+        # gamelog column groups.
+        'PASSING': 'PASS', 'RUSHING': 'RUSH', 'PUNTING': 'PUNT-', 'RECEIVING': 'REC', 'FUMBLES': 'FUM', 'TACKLES': 'TACK',
+        'INTERCEPTIONS': 'INT', 'FIELD GOALS': 'FG', 'PATS': 'XP',
+        # career stat tables (Passing Stats -> passing).
+        'Passing Stats': 'passing', 'Rushing Stats': 'rushing', 'Receiving Stats': 'receiving', 'Defensive Stats': 'defensive',
+        'Kicking Stats': 'kicking', 'Punting Stats': 'punting', 'Stats': ''})
+
+    def _parseslot(self):
+        """Wait (within the command's budget) until this command may parse. At most
+        parserMaxTrees commands hold parsed pages at once."""
+
+        if not self._trees.acquire(fetch.timeleft()):
+            raise fetch.DeadlineExceeded("No free parse slot.")
+
+    def _stream(self, table, within=None, grab=None):
+        """TableStream for the configured parser. See parsers.TableStream."""
+
+        self._parseslot()
+        return parsers.TableStream(table, within, grab, self.registryValue('parser'))
+
+    def _table(self, spec, html, fromEncoding=None):
+        """Extract spec (a parsers.TableSpec) from html with the configured parser.
+        Returns the rows as tuples, or None if the table isn't there."""
+
+        self._parseslot()
+        return spec.extract(html, self.registryValue('parser'), fromEncoding)
+
+    def _jsonfeed(self, url, body, count, key=None):
+        """The first count items of the JSON feed body fetched from url (see parsers.jsonhead).
+        If body hashes the same as the last one from url, the items decoded then are reused
+        (a feed shorter than count then is whole). Callers share them, so don't modify them."""
+
+        digest = hashlib.sha1(body).digest()
+        with self._feedslock:
+            cached = self._feeds.get(url)
+        if cached and cached[0] == digest and cached[1] == key and cached[2] >= count:
+            self._cache.count('parsed')
+            return cached[3][:count]
+        items = parsers.jsonhead(body, count, key)
+        with self._feedslock:
+            self._feeds.pop(url, None)  # re-insert so the most recent is last.
+            self._feeds[url] = (digest, key, count, items)
+            while len(self._feeds) > 100:
+                self._feeds.popitem(last=False)
+        return items
+
+    def _httprefresh(self, key, url, h, entry, l, stop):
+        """Background refresh of a stale cache entry. Errors are only logged."""
 
         try:
-            if h and d:
-                page = utils.web.getUrl(url, headers=h, data=d)
-            else:
-                if not h:
-                    h = {"User-Agent":"Mozilla/5.0 (X11; Ubuntu; Linux i686; rv:17.0) Gecko/20100101 Firefox/17.0"}
-                else:
-                    if h.get("User-Agent") is None:
-                        h["User-Agent"] = "Mozilla/5.0 (Windows NT 6.3; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/33.0.1750.154 Safari/537.36"
-                page = utils.web.getUrl(url, headers=h)
-            return page
-        except utils.web.Error as e:
-            self.log.error("ERROR opening {0} message: {1}".format(url, e))
-            return None
+            self._flights.do(key, self._httpfetch, key, url, h, entry, l, stop)
+        except fetch.FetchError as e:
+            self.log.error("ERROR refreshing {0} message: {1}".format(url, e))
+
+    def _soup(self, html, *targets, **kwargs):
+        """Parse html with the configured parser backend (see parsers.parse).
+        targets are the (tag, attrs) of the elements the command reads: only those
+        subtrees get built. If any target isn't on the page the whole thing is.
+        Other keyword args (convertEntities, fromEncoding) go to the parser.
+        The tree is decomposed when the command returns, so keep strings, not nodes."""
+
+        self._parseslot()
+        return self._trees.hold(parsers.parse(html, self.registryValue('parser'), targets, **kwargs))
 
     def _remove_accents(self, data):
         """Unicode normalize for news."""
@@ -184,55 +424,46 @@ class NFL(callbacks.Plugin):
     # INTERNAL TEAM DATABASE FUNCTIONS #
     ####################################
 
+    def _dbconnect(self, path):
+        """The read-only connection to the sqlite db at path. It stays open (don't close
+        it) and is only for the team and player index builds, which each db's Reloader
+        runs one at a time, outside of any command (so on no budget)."""
+
+        return self._dbs.get(path)
+
     def _allteams(self, conf=None, div=None):
         """Return a string of all valid teams (abbr)."""
 
-        with sqlite3.connect(self._nfldb) as conn:
-            cursor = conn.cursor()
-            if conf and not div:
-                cursor.execute("SELECT team FROM nfl WHERE conf=?", (conf,))
-            elif conf and div:
-                cursor.execute("SELECT team FROM nfl WHERE conf=? AND div=?", (conf, div,))
-            else:
-                cursor.execute("SELECT team FROM nfl")
-        # join all into list.
-        teamlist = [item[0] for item in cursor.fetchall()]
-        # return.
-        return " | ".join(sorted(teamlist))
+        return " | ".join(self._teams.current().teams(conf, div if conf else None))
 
     def _validteams(self, optteam):
         """Takes optteam as input function and sees if it is a valid team.
-        Aliases are supported via nflteamaliases table.
+        Aliases are supported via nflteamaliases table and the team names.
         Returns None upon error (no team name nor alias found.)
         Returns the team's 3-letter (ex: NE or ARI) if successful."""
 
-        # first, set default value.
-        returnval = None
-        # now, do our sql.
-        with sqlite3.connect(self._nfldb) as conn:
-            cursor = conn.cursor()  # we only do exact matching here. no fuzzy.
-            cursor.execute("SELECT team FROM nfl WHERE team=?", (optteam.upper(),))
-            teamrow = cursor.fetchone()
-            if teamrow:  # we found a team.
-                returnval = str(teamrow[0])
-            else:  # no team alias so we go back to normal team matching.
-                query = "SELECT team FROM nflteamaliases WHERE teamalias LIKE ?"  # check aliases second.
-                cursor.execute(query, ('%'+self._sanitizeName(optteam)+'%',))
-                aliasrow = cursor.fetchone()
-                if aliasrow:  # found team in regular nfl teams. no match? None.
-                    returnval = str(aliasrow[0])
-        # return time.
-        return returnval
+        # exact abbreviation first, then ranked aliases. no fuzzy matching here.
+        registry = self._teams.current()
+        return registry.valid(optteam.upper()) or registry.alias(self._sanitizeName(optteam))
+
+    def _teamnotfound(self, optteam):
+        """Error for an optteam _validteams did not find. Suggests close names if any."""
+
+        similar = self._teams.current().index.suggest(self._sanitizeName(optteam))
+        if similar:
+            return "ERROR: Team '{0}' not found. Did you mean: {1}".format(optteam, " | ".join(similar))
+        return "ERROR: Team not found. Valid teams are: {0}".format(self._allteams())
 
     def _translateTeam(self, db, column, optteam):
-        """Translates optteam (validated via _validteams) into proper string using database column."""
+        """Translates optteam (validated via _validteams) into proper string using database column.
+        Raises KeyError if no team has optteam in column."""
 
-        with sqlite3.connect(self._nfldb) as conn:
-            cursor = conn.cursor()
-            query = "SELECT %s FROM nfl WHERE %s='%s'" % (db, column, optteam)
-            cursor.execute(query)  # obv, breaks if string is not there.
-            row = cursor.fetchone()  # we want this so we can fix the function/code.
-            return (str(row[0])) # return.
+        return self._teams.current().translate(db, column, optteam)
+
+    def _translateTeams(self, db, column, values):
+        """_translateTeam for a whole column of scraped values. Unknown ones are passed through as-is."""
+
+        return self._teams.current().translate_many(db, column, values)
 
     ######################################
     # INTERNAL PLAYER DATABASE FUNCTIONS #
@@ -253,17 +484,12 @@ class NFL(callbacks.Plugin):
 
         optname = self._sanitizeName(optname)  # first sanitize input to compare.
         jaro, damerau = [], []  # empty lists to put our results in.
-        # now do our sql work.
-        with sqlite3.connect(self._playersdb) as db:
-            cursor = db.cursor()  # select all fullnames, eid, rid.
-            cursor.execute("SELECT fullname, eid, rid FROM players")
-            rows = cursor.fetchall()
-        # close. iterate over all rows and do math.
-        for row in rows:  # row[0] = fullname, row[1] = eid, row[2] = rid
-            jaroscore = jellyfish.jaro_distance(optname, row[0])  # jaro.
-            damerauscore = jellyfish.damerau_levenshtein_distance(optname, row[0])  #dld
-            jaro.append({'jaro':jaroscore, 'fullname':row[0], 'eid':row[1], 'rid':row[2]})  # add dict to list.
-            damerau.append({'damerau':damerauscore, 'fullname':row[0], 'eid':row[1], 'rid':row[2]})  # ibid.
+        # iterate over all players and do math.
+        for row in self._players.current().players:
+            jaroscore = jellyfish.jaro_distance(optname, row['fullname'])  # jaro.
+            damerauscore = jellyfish.damerau_levenshtein_distance(optname, row['fullname'])  #dld
+            jaro.append({'jaro':jaroscore, 'fullname':row['fullname'], 'eid':row['eid'], 'rid':row['rid']})  # add dict to list.
+            damerau.append({'damerau':damerauscore, 'fullname':row['fullname'], 'eid':row['eid'], 'rid':row['rid']})  # ibid.
         # now, we do two "sorts" to find the "top5" matches. reverse is opposite on each.
         jarolist = sorted(jaro, key=itemgetter('jaro'), reverse=True)[0:5]  # bot five.
         dameraulist = sorted(damerau, key=itemgetter('damerau'), reverse=False)[0:5]  # top five.
@@ -281,58 +507,37 @@ class NFL(callbacks.Plugin):
         """Return the specific id in column (eid, rid) for player."""
 
         optname = self._sanitizeName(optname)  # first sanitize.
-        with sqlite3.connect(self._playersdb) as db:  # everything within 'with' cuz we might need to access db.
-            cursor = db.cursor()  # first, check for an alias below.
-            query = "SELECT %s FROM players WHERE eid IN (SELECT id FROM aliases WHERE name LIKE ?)" % (table)
-            cursor.execute(query, ('%'+optname+'%',))  # wrap the alias in %.
-            aliasrow = cursor.fetchone()
-            if not aliasrow:  # if no alias.
-                cursor = db.cursor()  # go into normal player db. %first%last% search.
-                query = "SELECT %s FROM players WHERE fullname LIKE ?" % (table)
-                cursor.execute(query, ('%'+optname.replace(' ', '%')+'%',))  # wrap in % and replace space with wc.
-                row = cursor.fetchone()
-                if not row:  # we did not find a %name%match% nor alias. check dm for mispellings.
-                    namesplit = optname.split()  ############### clean-up function here. #####################
-                    if len(namesplit) > 1:  # we have more than one, first and last. assume 0 is first, 1 is last.
-                        fndm = doublemetaphone(namesplit[0])  # get our list of first-name dm.
-                        lndm = doublemetaphone(namesplit[1])  # get our list of last-name dm.
-                        if lndm[1] != '':  # if we have a secondary dm code.
-                            query = "SELECT %s FROM players WHERE lndm1='%s' AND lndm2='%s'" % (table, lndm[0], lndm[1])
-                        else:  # check only primary lastname dm.
-                            query = "SELECT %s FROM players WHERE lndm1='%s'" % (table, lndm[0])
-                        if fndm[1] != '': # likewise with first name.
-                            query += " AND fndm1='%s' AND fndm2='%s'" % (fndm[0], fndm[1])
-                        else:  # only check first name primary dm.
-                            query += " AND fndm1='%s'" % (fndm[0])
-                    else:  # assume one name given and that we check only on the last.
-                        lndm = doublemetaphone(namesplit[0])
-                        if lndm[1] != '':  # secondary dm code.
-                            query = "SELECT %s FROM players WHERE lndm1='%s' AND lndm2='%s'" % (table, lndm[0], lndm[1])
-                        else:  # primary dm check only.
-                            query = "SELECT %s FROM players WHERE lndm1='%s'" % (table, lndm[0])
-                    # now that we have DM query, execute.
-                    cursor.execute(query)  # query constructed above.
-                    row = cursor.fetchone()
-                    if not row:  # dm failed. last chance to try using fuzzy string matching.
-                        names = self._similarPlayers(optname)  # get a list of dicts back based on optname.
-                        for sname in names:  # iterate through what we give back. might be different # of elements.
-                            if 'jaro' in sname:  # don't know if we'll have jaro or damerau
-                                if sname['jaro'] > 0.7:  # over the 0.7 threshold is usually good.
-                                    optid = str(sname[table])  # grab the id we're looking for.
-                                    break  # stop iteration.
-                            if 'damerau' in sname:  # now if we have damerau. we're here if its a damerau match instead of jaro.
-                                if sname['damerau'] < 7:  # less than seven on it.
-                                    optid = str(sname[table])  # grab the id we're looking for.
-                                    break  # break.
-                        else:  # if we're here, we did NOT find any good jaro/damerau matches and out of the for loop.
-                            optid = names  # we return a list of names. this is used to display "similar players"
-                    else: # dm worked so we return the id matched by dm.
-                        optid = str(row[0])
-                else:  # fullname query worked so return the id matched by fullname.
-                    optid = str(row[0])
-            else:  # matched input via alias so we return that.
-                optid = str(aliasrow[0])
-        # close db and return the id.
+        players = self._players.current()  # one index for the whole lookup, even if a reload lands meanwhile.
+        aliasrow = players.alias(optname)  # first, check for an alias.
+        if not aliasrow:  # if no alias.
+            matches = players.like('%'+optname.replace(' ', '%')+'%')  # %first%last% search. replace space with wc.
+            row = matches[0] if matches else None
+            if not row:  # we did not find a %name%match% nor alias. check dm for mispellings.
+                namesplit = optname.split()  ############### clean-up function here. #####################
+                if len(namesplit) > 1:  # we have more than one, first and last. assume 0 is first, 1 is last.
+                    row = players.sounds(doublemetaphone(namesplit[1]), doublemetaphone(namesplit[0]))
+                elif namesplit:  # assume one name given and that we check only on the last.
+                    row = players.sounds(doublemetaphone(namesplit[0]))
+                if not row:  # dm failed. last chance to try using fuzzy string matching.
+                    names = self._similarPlayers(optname)  # get a list of dicts back based on optname.
+                    for sname in names:  # iterate through what we give back. might be different # of elements.
+                        if 'jaro' in sname:  # don't know if we'll have jaro or damerau
+                            if sname['jaro'] > 0.7:  # over the 0.7 threshold is usually good.
+                                optid = str(sname[table])  # grab the id we're looking for.
+                                break  # stop iteration.
+                        if 'damerau' in sname:  # now if we have damerau. we're here if its a damerau match instead of jaro.
+                            if sname['damerau'] < 7:  # less than seven on it.
+                                optid = str(sname[table])  # grab the id we're looking for.
+                                break  # break.
+                    else:  # if we're here, we did NOT find any good jaro/damerau matches and out of the for loop.
+                        optid = names  # we return a list of names. this is used to display "similar players"
+                else: # dm worked so we return the id matched by dm.
+                    optid = str(row[table])
+            else:  # fullname query worked so return the id matched by fullname.
+                optid = str(row[table])
+        else:  # matched input via alias so we return that.
+            optid = str(aliasrow[table])
+        # return the id.
         return optid
 
     #######################################
@@ -344,26 +549,41 @@ class NFL(callbacks.Plugin):
         Return stats about the NFL teams and players databases.
         """
 
-        # playerdb query.
-        with sqlite3.connect(self._playersdb) as db:
-            cursor = db.cursor()
-            cursor.execute("SELECT Count() FROM players")
-            numofplayers = cursor.fetchone()[0]
-            cursor.execute("SELECT Count() FROM aliases")
-            numofaliases = cursor.fetchone()[0]
-        # teamdb query.
-        with sqlite3.connect(self._nfldb) as db:
-            cursor = db.cursor()
-            cursor.execute("SELECT Count() FROM nfl")
-            numofteams = cursor.fetchone()[0]
-            cursor.execute("SELECT Count() FROM nflteamaliases")
-            numofteamaliases = cursor.fetchone()[0]
+        # counts from what is loaded (rebuilt when the files change).
+        (players, registry) = (self._players.current(), self._teams.current())
+        numofplayers, numofaliases = len(players.players), len(players.aliases)
+        numofteams, numofteamaliases = len(registry.rows), len(registry.aliases)
         # print.
         irc.reply("NFLDB: I know about {0} NFL players, {1} player aliases, {2} teams and {3} team aliases.".format(\
             numofplayers, numofaliases, numofteams, numofteamaliases))
 
     nfldb = wrap(nfldb)
 
+    def nflcachestats(self, irc, msg, args):
+        """
+        Display page cache statistics: size, hits, misses, 304 revalidations, stale serves, coalesced fetches and reused parses.
+        Also lists upstream hosts we are currently failing fast against and commands that ran over budget.
+        """
+
+        (numofpages, numofbytes) = self._cache.stats()
+        counters = self._cache.counters
+        kinds = ('hit', 'stale', 'miss', 'notmodified', 'fallback')
+        total = sum([counters[k] for k in kinds])
+        if total:  # percentages of all lookups.
+            rates = [(k, 100.0 * counters[k] / total) for k in kinds]
+        else:
+            rates = [(k, 0.0) for k in kinds]
+        irc.reply("NFL page cache: {0} pages ({1}B) :: {2} | {3}: {4} | {5}: {6}".format(numofpages, self._millify(numofbytes).strip(),\
+            " | ".join(["{0}: {1} ({2:.1f}%)".format(self._bold(k), counters[k], r) for (k, r) in rates]),\
+            self._bold('coalesced'), self._flights.coalesced, self._bold('parsed'), counters['parsed']))
+        downhosts = self._guards.opened()
+        if downhosts:
+            irc.reply("{0}: {1}".format(self._red("Failing hosts (circuit open)"), " | ".join(downhosts)))
+        if self._overruns:
+            irc.reply("{0}: {1}".format(self._red("Over budget"), " | ".join(["{0}: {1}".format(k, v) for (k, v) in self._overruns.most_common()])))
+
+    nflcachestats = wrap(nflcachestats)
+
     ####################
     # PUBLIC FUNCTIONS #
     ####################
@@ -412,6 +632,9 @@ class NFL(callbacks.Plugin):
 
     nflteams = wrap(nflteams, [optional('somethingWithoutSpaces'), optional('somethingWithoutSpaces')])
 
+    _hoftable = parsers.TableSpec(('table', {'id':'hofers'}), (('player', 1), ('position', 2), ('year', 3, int)),\
+        rows=lambda row: row.get('class') == '' and row.find('td', {'align':'right'}) is not None)
+
     def nflhof(self, irc, msg, args, optyear):
         """[year]
         Display NFL Hall Of Fame inductees for year 1963 and on. Defaults to the latest year.
@@ -425,23 +648,21 @@ class NFL(callbacks.Plugin):
                 return
         # build and process url.
         url = self._b64decode('aHR0cDovL3d3dy5wcm8tZm9vdGJhbGwtcmVmZXJlbmNlLmNvbS9ob2Yv')
-        html = self._httpget(url)
+        html = self._httpget(url, stop=('id="hofers"', '</table>'))  # nothing we need after the table.
         if not html:
             irc.reply("ERROR: Failed to fetch {0}.".format(url))
             self.log.error("ERROR opening {0}".format(url))
             return
-        # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        table = soup.find('table', attrs={'id':'hofers'})
-        rows = table.findAll('tr', attrs={'class':''})
+        # process html. rows stream off the table.
+        rows = self._table(self._hoftable, html, fromEncoding='utf-8')
+        if not rows:
+            irc.reply("ERROR: I could not find the Hall of Fame table. Formatting might have changed.")
+            return
         # dict container for output.
         nflhof = collections.defaultdict(list)
         # each row on the page is HOF. insert with key as year, value is the player.
         for row in rows:
-            num = row.find('td', attrs={'align':'right'})
-            if num:
-                tds = [item.getText() for item in row.findAll('td')]
-                nflhof[int(tds[3])].append("{0} ({1})".format(tds[1], tds[2]))
+            nflhof[row.year].append("{0} ({1})".format(row.player, row.position))
         # if we don't have one specified, get the last year in the sort.
         if not optyear:
             optyear = nflhof.keys()[-1]
@@ -455,6 +676,9 @@ class NFL(callbacks.Plugin):
 
     nflhof = wrap(nflhof, [optional('int')])
 
+    _seasontable = parsers.TableSpec(('table', {'id':'team_gamelogs'}), (('week', 0), ('date', 2), ('result', 4), ('vsat', 7),\
+        ('opp', 8), ('tmscore', 9), ('oppscore', 10)), grab={'title': ('h1', {'class':'float_left'})}, section='tbody', width=21)
+
     def nflseasonsummary(self, irc, msg, args, optteam, optyear):
         """<TEAM> <YEAR>
         Display a team's schedule with win/loss from season.
@@ -462,10 +686,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
         # test for valid year.
         if not self._validate(optyear, '%Y'):
             irc.reply("ERROR: '{0}' is an invalid year. Must input a valid year.".format(optyear))
@@ -473,51 +698,40 @@ class NFL(callbacks.Plugin):
         # build and fetch url.
         lookupteam = self._translateTeam('pfrurl', 'team', optteam)
         url = self._b64decode('aHR0cDovL3d3dy5wcm8tZm9vdGJhbGwtcmVmZXJlbmNlLmNvbS90ZWFtcy8=') + '%s/%d.htm' % (lookupteam, optyear)
-        html = self._httpget(url)
+        html = self._httpget(url, stop=('id="team_gamelogs"', '</table>'))  # h1 and the gamelog are all we need.
         if not html:
             irc.reply("ERROR: Failed to fetch {0}.".format(url))
             self.log.error("ERROR opening {0}".format(url))
             return
-        # process html
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        title = soup.find('h1', attrs={'class':'float_left'}).getText()  # team/season title.
-        table = soup.find('table', attrs={'id':'team_gamelogs'})  # table.
-        if not table:
+        # process html. rows come from the tbody.
+        games = self._table(self._seasontable, html, fromEncoding='utf-8')
+        if games is None:
             irc.reply("ERROR: I did not find a gamelog for {0} in {1}".format(optteam, optyear))
             return
-        tbody = table.find('tbody')  # need the rows from here not elsewhere.
-        rows = tbody.findAll('tr')  # so we can just find tr.
+        if games.skipped:  # make sure its a year played. crude but works for now.
+            irc.reply("ERROR: I did not find a complete record for {0} in {1}. Season must be completed.".format(optteam, optyear))
+            return
+        title = games.grabbed.get('title', '')  # team/season title.
         # list container to put each game in.
         nflseason = []
-        # each row is a game. there are two header rows we have conditionals for.
-        for row in rows:
-            tds = row.findAll('td')
-            if len(tds) is not 21:  # make sure its a year played. crude but works for now.
-                irc.reply("ERROR: I did not find a complete record for {0} in {1}. Season must be completed.".format(optteam, optyear))
-                return
-            week = tds[0].getText()
+        # shorten opponents. older years have non-existent franchises; those keep their name.
+        opps = self._translateTeams('team', 'full', [game.opp for game in games])
+        # each row is a game.
+        for (game, opp) in zip(games, opps):
+            week = game.week
             if week.isdigit():  # If we're in a non-playoff week, prefix # with W.
                 week = "W{0}".format(week)  # append W.
-            date = tds[2].getText()
-            if date == "Playoffs":  # skip this row.
+            if game.date == "Playoffs":  # skip this row.
                 continue
             else:  # conv date (October 24 -> ##/##)
-                date = self._dtFormat("%m/%d", date, "%B %d")
-            result = tds[4].getText()  # W or L or T.
-            vsat = tds[7].getText()   # @ or blank.
+                date = self._dtFormat("%m/%d", game.date, "%B %d")
+            vsat = game.vsat   # @ or blank.
             if vsat != "@":  # if it's not @, we must add in vs.
                 vsat = "vs."
-            opp = tds[8].getText()
             if opp == "Bye Week":  # skip if "Bye Week"
                 continue
-            else:  # is opp. Shorten via translateTeam.
-                try:  # try to shorten. we do this because older years have non-existent franchises.
-                    opp = self._translateTeam('team', 'full', opp)
-                except:  # pass if not found (keeps original team).
-                    pass
-            tmscore = tds[9].getText()
-            oppscore = tds[10].getText()  # below, we finally append to the list.
-            nflseason.append("{0} {1} {2} {3}{4} ({5}-{6})".format(self._red(week), date, result, self._ul(vsat), self._bold(opp), tmscore, oppscore))
+            # below, we finally append to the list.
+            nflseason.append("{0} {1} {2} {3}{4} ({5}-{6})".format(self._red(week), date, game.result, self._ul(vsat), self._bold(opp), game.tmscore, game.oppscore))
         # output time.
         irc.reply("{0} :: {1}".format(self._blue(title), " | ".join(nflseason)))
 
@@ -541,7 +755,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process HTML.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('div', {'id':'awards'}), fromEncoding='utf-8')
         if not soup.find('h2', text="Award Winners"):
             irc.reply("ERROR: Could not find NFL Awards for the {0} season. Perhaps you are asking for the current season in-progress.".format(optyear))
             return
@@ -562,6 +776,9 @@ class NFL(callbacks.Plugin):
 
     nflawards = wrap(nflawards, [('somethingWithoutSpaces')])
 
+    _superbowltable = parsers.TableSpec(('table', {'id':'superbowls'}), (('year', 0), ('roman', 1), ('winner', 2), ('winpts', 3),\
+        ('loser', 4), ('losepts', 5), ('mvp', 6), ('stadium', 7), ('city', 8), ('state', 9)), skip=1, strict=True)  # first row is the header.
+
     def nflsuperbowl(self, irc, msg, args, optbowl):
         """<number|roman numeral|year>
         Display information from a specific Super Bowl.
@@ -573,25 +790,22 @@ class NFL(callbacks.Plugin):
                 optbowl = self._int_to_roman(int(optbowl))  # convert to roman.
         # fetch url.
         url = self._b64decode('aHR0cDovL3d3dy5wcm8tZm9vdGJhbGwtcmVmZXJlbmNlLmNvbS9zdXBlci1ib3dsLw==')
-        html = self._httpget(url)
+        html = self._httpget(url, stop=('id="superbowls"', '</table>'))  # nothing we need after the table.
         if not html:
             irc.reply("ERROR: Failed to fetch {0}.".format(url))
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        table = soup.find('table', attrs={'id':'superbowls'})
-        rows = table.findAll('tr')[1:]  # first row is the header.
+        rows = self._table(self._superbowltable, html, fromEncoding='utf-8')
         # key/value dict we use for output.
         sb_data = collections.defaultdict(list)
         # one row per superbowl.
-        for row in rows:
-            tds = [item.getText() for item in row.findAll('td')]
-            year = tds[0]  # year that we use as a key and part of the value.
-            roman = re.sub('[^A-Z_]+', '', tds[1], re.UNICODE)  # clean up roman here.
+        for sb in rows or []:
+            year = sb.year  # year that we use as a key and part of the value.
+            roman = re.sub('[^A-Z_]+', '', sb.roman, re.UNICODE)  # clean up roman here.
             # value part is the appendString.
             appendString = "{0} Super Bowl {1} :: {2} {3} - {4} {5} :: MVP: {6} :: Location: {7} ({8}, {9})".format(\
-                self._bold(year), self._red(roman), tds[2], tds[3], tds[4], tds[5], tds[6], tds[7], tds[8], tds[9])
+                self._bold(year), self._red(roman), sb.winner, sb.winpts, sb.loser, sb.losepts, sb.mvp, sb.stadium, sb.city, sb.state)
             # append now. we double append because it's quick and cheap.
             sb_data[roman] = appendString
             sb_data[year] = appendString
@@ -604,6 +818,9 @@ class NFL(callbacks.Plugin):
 
     nflsuperbowl = wrap(nflsuperbowl, [('somethingWithoutSpaces')])
 
+    _head2headtable = parsers.TableSpec(('table', {'id':'head_to_head'}), (('team', 0, lambda td: td.find('a').get('href').split('/')[2]),\
+        ('wins', 1), ('loss', 2), ('ties', 3), ('perc', 4), ('pwins', 7), ('ploss', 8)), section='tbody', strict=True)  # team is the pfrurl.
+
     def nflhead2head(self, irc, msg, args, optteam, optopp):
         """<team> <opp>
         Show all-time head-to-head records for regular season and playoffs of teams.
@@ -611,14 +828,16 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
-        optopp = self._validteams(optopp)
-        if not optopp: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        optteam = team
+        team = self._validteams(optopp)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optopp))
             return
+        optopp = team
         # make sure they're not the same.
         if optteam == optopp:
             irc.reply("ERROR: Teams must be different from each other.")
@@ -626,31 +845,19 @@ class NFL(callbacks.Plugin):
         # process and fetch url.
         lookupteam = self._translateTeam('pfrurl', 'team', optteam)
         url = self._b64decode('aHR0cDovL3d3dy5wcm8tZm9vdGJhbGwtcmVmZXJlbmNlLmNvbS90ZWFtcw==') + '/%s/head-to-head.htm' % lookupteam
-        html = self._httpget(url)
+        html = self._httpget(url, stop=('id="head_to_head"', '</table>'))  # nothing we need after the table.
         if not html:
             irc.reply("ERROR: Failed to fetch {0}.".format(url))
             self.log.error("ERROR opening {0}".format(url))
             return
         # work with html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        table = soup.find('table', attrs={'id':'head_to_head'}).find('tbody')
-        rows = table.findAll('tr')[0:31]  # displays defunct so we limit by # of teams.
+        rows = self._table(self._head2headtable, html, fromEncoding='utf-8') or []
         # dict for output.
         head2head = collections.defaultdict(list)
-        # each row is one of the 32
-        for row in rows:
-            tds = row.findAll('td')
-            team = tds[0].find('a')['href'].split('/')[2]  # translateTeam pfrurl
-            team = self._translateTeam('team', 'pfrurl', team)
-            wins = tds[1].getText()
-            loss = tds[2].getText()
-            ties = tds[3].getText()
-            # total = wins + loss + ties
-            perc = tds[4].getText()
-            pwins = tds[7].getText()
-            ploss = tds[8].getText()
-            # ptotal = pwins + ploss
-            head2head[team] = ":: REG SEASON {0}-{1}-{2} ({3}) :: PLAYOFFS {4}-{5}".format(wins, loss, ties, perc, pwins, ploss)
+        # each row is one of the 32. displays defunct so we limit by # of teams.
+        rows = rows[0:31]
+        for (row, team) in zip(rows, self._translateTeams('team', 'pfrurl', [row.team for row in rows])):
+            head2head[team] = ":: REG SEASON {0}-{1}-{2} ({3}) :: PLAYOFFS {4}-{5}".format(row.wins, row.loss, row.ties, row.perc, row.pwins, row.ploss)
         # output time.
         output = head2head.get(optopp)
         if not output:
@@ -668,10 +875,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
         # process and fetch url.
         url = self._b64decode('aHR0cDovL2hvc3RlZC5zdGF0cy5jb20vZmIvcHJhY3RpY2UuYXNw')
         html = self._httpget(url)
@@ -680,7 +888,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # work with html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         # first, check if we have any practice reports. Offseason?
         if soup.find('div', attrs={'class':'warning'}, text="No practice report found."):
             irc.reply("ERROR: No practice reports found. Is it the offseason?")
@@ -716,10 +924,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
         # check to make sure year is valid and between 1965 and now.
         testdate = self._validate(optyear, '%Y')
         if not testdate and (1965 > int(optyear) > datetime.datetime.now().year):
@@ -733,7 +942,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('table', {'border':'1'}), fromEncoding='utf-8')
         table = soup.find('table', attrs={'border':'1'})  # this is amb.
         firstrow = table.find('tr')  # our simple error check.
         h1 = firstrow.find('h1')
@@ -764,6 +973,8 @@ class NFL(callbacks.Plugin):
 
     nflteamdraft = wrap(nflteamdraft, [('somethingWithoutSpaces'), ('int')])
 
+    _weathertable = parsers.TableSpec(('table', {'class':'main'}), (('away', 0), ('home', 4), ('timeorscore', 5), ('temp', 8)), section='tbody', strict=True)
+
     def nflweather(self, irc, msg, args, optteam):
         """<team>
         Display weather for the next game.
@@ -771,10 +982,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
         # fetch url.
         url = self._b64decode('aHR0cDovL3d3dy5uZmx3ZWF0aGVyLmNvbS8=')
         html = self._httpget(url)
@@ -783,20 +995,16 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        table = soup.find('table', attrs={'class':'main'})
-        tbody = table.find('tbody')
-        rows = tbody.findAll('tr')
+        games = self._table(self._weathertable, html, fromEncoding='utf-8')
         # container for output.
         weatherList = collections.defaultdict(list)
         # each row is a game.
-        for row in rows:
-            tds = [item.getText() for item in row.findAll('td')]
-            awayTeam = self._translateTeam('team', 'short', tds[0])  # translate into the team for each.
-            homeTeam = self._translateTeam('team', 'short', tds[4])
-            timeOrScore = tds[5]
-            gameTemp = tds[8]
-            appendString = "{0}@{1} - {2} - {3}".format(awayTeam, self._bold(homeTeam), timeOrScore, gameTemp)
+        games = games or []
+        # translate into the team for each.
+        aways = self._translateTeams('team', 'short', [game.away for game in games])
+        homes = self._translateTeams('team', 'short', [game.home for game in games])
+        for (game, awayTeam, homeTeam) in zip(games, aways, homes):
+            appendString = u"{0}@{1} - {2} - {3}".format(awayTeam, self._bold(homeTeam), game.timeorscore, game.temp)  # temps have a degree sign.
             weatherList[awayTeam].append(appendString)
             weatherList[homeTeam].append(appendString)
         # output time.
@@ -821,7 +1029,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('div', {'id':'my-teams-table'}), fromEncoding='utf-8')
         div = soup.find('div', attrs={'id':'my-teams-table'})
         table = div.find('table', attrs={'class':'tablehead'})
         rows = table.findAll('tr', attrs={'class':re.compile('^oddrow team.*|^evenrow team.*')})
@@ -843,6 +1051,9 @@ class NFL(callbacks.Plugin):
 
     nfltrans = wrap(nfltrans)
 
+    _probowltable = parsers.TableSpec(('table', {'id':'pro_bowl'}), (('pos', 0), ('player', 1), ('team', 2)),\
+        grab={'h1': ('h1', {})}, section='tbody', rows={'class':''}, strict=True)
+
     def nflprobowl(self, irc, msg, args, optyear):
         """<year>
         Display NFL Pro Bowlers for a year.
@@ -856,41 +1067,38 @@ class NFL(callbacks.Plugin):
             return
         # build and fetch url.
         url = self._b64decode('aHR0cDovL3d3dy5wcm8tZm9vdGJhbGwtcmVmZXJlbmNlLmNvbS95ZWFycw==') + '/%s/probowl.htm' % optyear
-        html = self._httpget(url)
+        html = self._httpget(url, stop=('id="pro_bowl"', '</table>'))  # h1 and the table are all we need.
         if not html:
             irc.reply("ERROR: Failed to fetch {0}.".format(url))
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        h1 = soup.find('h1')
-        if not soup.find('table', attrs={'id':'pro_bowl'}):  # check to make sure we have probowlers.
+        rows = self._table(self._probowltable, html, fromEncoding='utf-8')
+        if rows is None:  # check to make sure we have probowlers.
             irc.reply("ERROR: I could not find any Pro Bowlers for {0}. Perhaps you specified this year where none have been selected yet?".format(optyear))
             return
-        table = soup.find('table', attrs={'id':'pro_bowl'}).find('tbody')
-        rows = table.findAll('tr', attrs={'class':''})
         # setup containers
         teams = {}  # container to count teams.
         positions = {}  # container to count positions.
         players = []  # put all in a container to output.
         # process each player.
-        for row in rows:
-            tds = [item.getText() for item in row.findAll('td')]
-            pos = tds[0]
-            player = tds[1]
-            tm = tds[2]
+        for (pos, player, tm) in rows:
             teams[tm] = teams.get(tm, 0) + 1 # team++.
             positions[pos] = positions.get(pos, 0) + 1 # positions++.
             players.append("{0}, {1} ({2})".format(self._bold(player), tm, pos)) # append player to list
         # we display the heading, total teams (len) and use teams, sorted in rev, top10.
         irc.reply("{0} :: Total Players: {1} - Total Teams: {2} - Top Teams: {3}".format(\
-            self._red(h1.getText()), self._ul(len(players)), self._ul(len(teams)),\
+            self._red(rows.grabbed.get('h1', '')), self._ul(len(players)), self._ul(len(teams)),\
             [k + ": " + str(v) for (k,v) in sorted(teams.items(), key=lambda x: x[1], reverse=True)[0:10]]))
         # now output players.
         irc.reply("{0}".format(" | ".join(players)))
 
     nflprobowl = wrap(nflprobowl, [('int')])
 
+    # team (cell 2) is broken due to html comments.
+    _finestable = parsers.TableSpec(('table', {}), (('date', 0), ('player', 3), ('fine', 4), ('reason', 5)),\
+        within=('div', {'class':'standing'}), grab={'heading': ('div', {'class':'title1'})}, rows={'class':'data'}, strict=True)
+
     def nflfines(self, irc, msg, args, optlist):
         """[--num #]
         Display latest NFL fines. Use --num # to display more than 3.
@@ -914,22 +1122,19 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html. little error checking.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES)
-        heading = soup.find('div', attrs={'class':'title1'})
-        div = soup.find('div', attrs={'class':'standing'})
-        table = div.find('table')
-        rows = table.findAll('tr', attrs={'class':'data'})
+        rows = self._table(self._finestable, html)
+        if rows is None:
+            irc.reply("ERROR: I could not find the fines table on {0}.".format(url))
+            return
         # container for output.
         append_list = []
         # each row is a fine.
         for row in rows[0:int(optnumber)]:
-            tds = [item.getText() for item in row.findAll('td')]
-            # team = tds[2] # team is broken due to html comments
-            append_list.append("{0} {1} {2} :: {3}".format(tds[0], self._bold(tds[3]), tds[4], tds[5]))
+            append_list.append("{0} {1} {2} :: {3}".format(row.date, self._bold(row.player), row.fine, row.reason))
 
         for i, each in enumerate(append_list[0:int(optnumber)]):
             if i is 0:  # only for header row.
-                irc.reply("Latest {0} :: Total {1} Fines.".format(heading.getText(), len(rows)))
+                irc.reply("Latest {0} :: Total {1} Fines.".format(rows.grabbed.get('heading', ''), len(rows)))
                 irc.reply(each)
             else:
                 irc.reply(each)
@@ -949,7 +1154,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES)
+        soup = self._soup(html)
         tables = soup.findAll('table', attrs={'class':'table'})
         subheading = soup.find('div', attrs={'class':'sub dark'})
         # container output.
@@ -1011,7 +1216,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html.replace('\n',''))
+        soup = self._soup(html.replace('\n',''), convertEntities=None)
         tbody = soup.find('tbody')
         rows = tbody.findAll('tr')[0:5] # just do top5 because some lists are long.
 
@@ -1167,26 +1372,27 @@ class NFL(callbacks.Plugin):
             else:
                 url += '&year=postseason_%s' % optyear
         # build and fetch url.
-        html = self._httpget(url)
+        html = self._httpget(url, stop=('ysptblthmsts', '</table>'))  # year picker and the table are all we need.
         if not html:
             irc.reply("ERROR: Failed to fetch {0}.".format(url))
             self.log.error("ERROR opening {0}".format(url))
             return
-        # process html.
-        soup = BeautifulSoup(html.replace('&nbsp;',''))
-        selectedyear = soup.find('select', attrs={'name':'year'}).find('option', attrs={'selected':'selected'})  # creative way to find the year.
-        table = soup.find('tr', attrs={'class':'ysptblthmsts', 'align':'center'}).findParent('table')
-        # header = table.findAll('tr')[1].findAll('td')
-        rows = table.findAll('tr')[2:]  # start at 3 due to headers.
+        # process html. the table is the one holding the header row.
+        stream = self._stream(('tr', {'class':'ysptblthmsts', 'align':'center'}),\
+            grab={'year': ('option', {'selected':'selected'}, ('select', {'name':'year'}))})  # creative way to find the year.
         # container we'll put all stats in.
         append_list = []
         # each row is a player, ranked in order.
-        for row in rows:
-            tds = [item for item in row.findAll('td')]
+        for i, row in enumerate(stream.rows(html)):
+            if i < 2:  # start at 3 due to headers.
+                continue
             sortfield = row.find('span', attrs={'class':'yspscores'})  # whatever field you are sorting by will have this span inside the td.
-            append_list.append("{0} ({1}) - {2}".format(self._bold(tds[0].getText()), tds[1].getText(), sortfield.getText()))
+            append_list.append("{0} ({1}) - {2}".format(self._bold(row[0]), row[1], sortfield))
+        if not stream.found:
+            irc.reply("ERROR: I could not find the stats table on {0}. Formatting might have changed.".format(url))
+            return
         # output time.
-        title = "Top in {0}({1}) for {2}".format(optcategory, optstat, selectedyear.getText())
+        title = "Top in {0}({1}) for {2}".format(optcategory, optstat, stream.grabbed.get('year', optyear or 'current'))
         output = "{0} :: {1}".format(self._red(title), " | ".join([item for item in append_list]))
         irc.reply(output)
 
@@ -1199,10 +1405,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
         # build and fetch url.
         url = self._b64decode('aHR0cDovL2VzcG4uZ28uY29tL25mbC90ZWFtL18vbmFtZQ==') + '/%s/' % optteam
         html = self._httpget(url)
@@ -1211,7 +1418,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('div', {'class':'mod-container mod-stat'}), fromEncoding='utf-8')
         div = soup.find('div', attrs={'class':'mod-container mod-stat'})
         h3 = div.find('h3')
         statsfind = div.findAll('div', attrs={'class':re.compile('span-1.*?')})
@@ -1229,6 +1436,40 @@ class NFL(callbacks.Plugin):
 
     nflteamrankings = wrap(nflteamrankings, [('somethingWithoutSpaces')])
 
+    def _standingstable(self, html):
+        """Extract the standings page into (s, ll): s maps division (AFC EAST) to a list
+        of team rows (dicts keyed by column), ll maps column to the lengths of its cells.
+        Returns None if the table isn't there. For nflstandings (see _parsed)."""
+
+        soup = self._soup(html, ('table', {'class':'tablehead', 'cellspacing':'1', 'cellpadding':'3'}), fromEncoding='utf-8')
+        table = soup.find('table', attrs={'class':'tablehead', 'cellspacing':'1', 'cellpadding':'3'})
+        if not table:
+            return None
+        # process the rows (teams) and setup containers.
+        rows = table.findAll('tr', attrs={'class':re.compile('(^oddrow|^evenrow).*')})
+        s = collections.defaultdict(list)  # container to put all the html data into.
+        ll = collections.defaultdict(list)  # sep data structure to determine length.
+        for row in rows:
+            # find the colhead
+            colhead = row.findPrevious('tr', attrs={'class':'colhead'})
+            chcell = [i.getText() for i in colhead.findAll('td')]
+            # NFC EAST, W, L, T, PCT, HOME, ROAD, DIV, CONF, PF, PA, DIFF, STRK
+            div = chcell[0]  # first one is the division.
+            t = {}
+            for i, td in enumerate(row.findAll('td')):
+                # iterate over the "rows" and add into s container.
+                # we also add into lengthlist the lengths for output later.
+                if i == 0:  # first row the colhead is DIV so we replace w/team.
+                    t['TEAM'] = td.getText()
+                    ll['TEAM'].append(len(td.getText()))
+                else:  # anyting else we use the chcell.
+                    t[chcell[i]] = td.getText()
+                    ll[chcell[i]].append(len(td.getText()))
+            # now add the tmp dict into the defaultdict
+            s[div].append(t)
+        # plain dicts: these are shared (see _parsed) and a defaultdict grows on every missing key.
+        return (dict(s), dict(ll))
+
     def nflstandings(self, irc, msg, args, optlist, optconf, optdiv):
         """[--detailed] [conf] [division]
         Display NFL standings for a division. Requires a conference and division.
@@ -1256,40 +1497,18 @@ class NFL(callbacks.Plugin):
             irc.reply("ERROR: Failed to fetch {0}.".format(url))
             self.log.error("ERROR opening {0}".format(url))
             return
-        # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        table = soup.find('table', attrs={'class':'tablehead', 'cellspacing':'1', 'cellpadding':'3'})
+        # process html. (s, ll) below are shared via the cache. read only.
+        standings = self._parsed(url, html, self._standingstable, 2)
         # sanity check.
-        if not table:
+        if not standings:
             irc.reply("ERROR: I can't find  the NFL standings table. Something broke.")
             return
-        # process the rows (teams) and setup containers.
-        rows = table.findAll('tr', attrs={'class':re.compile('(^oddrow|^evenrow).*')})
-        s = collections.defaultdict(list)  # container to put all the html data into.
-        ll = collections.defaultdict(list)  # sep data structure to determine length.
-        for row in rows:
-            # find the colhead
-            colhead = row.findPrevious('tr', attrs={'class':'colhead'})
-            chcell = [i.getText() for i in colhead.findAll('td')]
-            # NFC EAST, W, L, T, PCT, HOME, ROAD, DIV, CONF, PF, PA, DIFF, STRK
-            div = chcell[0]  # first one is the division.
-            t = {}
-            for i, td in enumerate(row.findAll('td')):
-                # iterate over the "rows" and add into s container.
-                # we also add into lengthlist the lengths for output later.
-                if i == 0:  # first row the colhead is DIV so we replace w/team.
-                    t['TEAM'] = td.getText()
-                    ll['TEAM'].append(len(td.getText()))
-                else:  # anyting else we use the chcell.
-                    t[chcell[i]] = td.getText()
-                    ll[chcell[i]].append(len(td.getText()))
-            # now add the tmp dict into the defaultdict
-            s[div].append(t)
+        (s, ll) = standings
         # now that we're done, lets prep for output.
         out = optconf + " " + optdiv  # out = key for s like (AFC EAST)
         # now we do our actual output.
         if not detailed:  # short output one-liner.
-            short = [self._bold(z['TEAM']) + " (" + z['W'] + "-" + z['L'] + "-" + z['T'] + ")" for z in s[out]]
+            short = [self._bold(z['TEAM']) + " (" + z['W'] + "-" + z['L'] + "-" + z['T'] + ")" for z in s.get(out, [])]
             irc.reply("{0} :: {1}".format(self._red(out), " ".join(short)))
         else:  # detailed.
             # we have to do a static order. it can break but makes the code simpler.
@@ -1299,16 +1518,16 @@ class NFL(callbacks.Plugin):
             # iterate over the header row list. we use the list entries as keys for lengthlist.
             for hr in outorder:
                 if hr == "TEAM":  # first entry is normally TEAM. we replace this with the conf but maintain spacing.
-                    hrs.append("{0:{1}}".format(out, max(ll[hr])+4, key=int))
+                    hrs.append("{0:{1}}".format(out, max(ll.get(hr, [0]))+4, key=int))
                 else:  # regular append with hr = key matching up in ll + 2 for spacing.
-                    hrs.append("{0:{1}}".format(hr, max(ll[hr])+4, key=int))
+                    hrs.append("{0:{1}}".format(hr, max(ll.get(hr, [0]))+4, key=int))
             # output the header row. we join all entries in the list.
             irc.reply(" ".join(hrs))
             # now lets iterate over the keys of out, which are rows of each team.
-            for o in s[out]:  # out = values in s that match our key (conf + div) and is verified above.
+            for o in s.get(out, []):  # out = values in s that match our key (conf + div) and is verified above.
                 l = []  # list container we populate with each line to display.
                 for y in outorder:  # we iterate over the outorder list to populate l. the spacing is done via ll+2.
-                    l.append("{0:<{1}}".format(o[y],  max(ll[y])+4, key=int))
+                    l.append("{0:<{1}}".format(o.get(y, ''),  max(ll.get(y, [0]))+4, key=int))
                 # now output one line at a time.  we join all entries in the list.
                 irc.reply(" ".join(l))
 
@@ -1341,10 +1560,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
         # need the specific spotrac for the url.
         lookupteam = self._translateTeam('spotrac', 'team', optteam)
         # fetch url.
@@ -1355,7 +1575,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         teamtitle = soup.find('title')
         basespan = soup.find('span', text="Cap Space")  # we derive the tbody via a specific span.
         tbody = basespan.findParent('tbody')  # find the proper tbody.
@@ -1392,10 +1612,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
         # build and fetch url.
         url = self._b64decode('aHR0cDovL2VuLndpa2lwZWRpYS5vcmcvd2lraS9MaXN0X29mX2N1cnJlbnRfTmF0aW9uYWxfRm9vdGJhbGxfTGVhZ3VlX3N0YWZmcw==')
         html = self._httpget(url)
@@ -1404,7 +1625,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html from wiki.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         tables = soup.findAll('table', attrs={'style':'text-align: left;'})
         # container for output.
         coachingstaff = collections.defaultdict(list)
@@ -1424,6 +1645,21 @@ class NFL(callbacks.Plugin):
 
     nflcoachingstaff = wrap(nflcoachingstaff, [('somethingWithoutSpaces')])
 
+    _rosterspec = parsers.TableSpec(('tr', {'class':re.compile('^oddrow.*?|^evenrow.*?')}), (('number', 0), ('player', 1), ('position', 2)),\
+        within=('div', {'id':'my-players-table'}), rows={'class':re.compile('^oddrow.*?|^evenrow.*?')}, strict=True)
+
+    def _rostertable(self, html):
+        """Extract a team roster page into (by number, by position) dicts. For nflroster (see _parsed)."""
+
+        # setup defaultdicts for output.
+        nflroster = collections.defaultdict(list)
+        positiongroups = collections.defaultdict(list)
+        for (number, player, position) in self._table(self._rosterspec, html, fromEncoding='utf-8') or []:
+            nflroster[number].append("{0} ({1})".format(player, position))
+            positiongroups[position].append("#{0} {1}".format(number, player))
+        # plain dicts: shared via _parsed, so lookups must not add keys.
+        return (dict(nflroster), dict(positiongroups))
+
     def nflroster(self, irc, msg, args, optteam, optposition):
         """<team> <position/#>
 
@@ -1432,10 +1668,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
         # setup the defaults.
         lookupteam = optteam
         useNum = True
@@ -1453,21 +1690,8 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
 
-        # process html
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        div = soup.find('div', attrs={'id':'my-players-table'})
-        # setup defaultdicts for output.
-        nflroster = collections.defaultdict(list)
-        positiongroups = collections.defaultdict(list)
-        # find the rows.
-        rows = div.findAll('tr', attrs={'class':re.compile('^oddrow.*?|^evenrow.*?')})
-        for row in rows:
-            tds = row.findAll('td')
-            number = tds[0].getText()
-            player = tds[1].getText()
-            position = tds[2].getText()
-            nflroster[number].append("{0} ({1})".format(player, position))
-            positiongroups[position].append("#{0} {1}".format(number, player))
+        # process html. shared via the cache so read only.
+        (nflroster, positiongroups) = self._parsed(url, html, self._rostertable, 2)
         # prepare output.
         if useNum:
             if optposition in nflroster:
@@ -1484,6 +1708,10 @@ class NFL(callbacks.Plugin):
 
     nflroster = wrap(nflroster, [('somethingWithoutSpaces'), ('somethingWithoutSpaces')])
 
+    _draftpickstable = parsers.TableSpec(('table', {'class':'fulldraftorder'}), (('team', 0, lambda td: td.replace('WAS','WSH')),\
+        ('picks', 1), ('rounds', 2)), within=('div', {'id':'content_nosky'}),\
+        grab={'h1': ('h1', {'class':'newpagetitle'}, ('div', {'id':'content_nosky'}))}, skip=1, strict=True)  # WAS: a hack for people using WAS instead of WSH.
+
     def nflteamdraftpicks(self, irc, msg, args, optteam):
         """<team>
         Display total NFL draft picks for a team and what round.
@@ -1491,10 +1719,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
 
         url = self._b64decode('aHR0cDovL3d3dy5mZnRvb2xib3guY29tL25mbF9kcmFmdA==') + '/' + str(datetime.datetime.now().year) + '/nfl_draft_order_full.cfm'
         html = self._httpget(url)
@@ -1503,23 +1732,15 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
 
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        if not soup.find('div', attrs={'id':'content_nosky'}):
+        rows = self._table(self._draftpickstable, html, fromEncoding='utf-8')
+        if rows is None:
             irc.reply("ERROR: Something broke on formatting.")
             return
-
-        div = soup.find('div', attrs={'id':'content_nosky'})
-        h1 = div.find('h1', attrs={'class':'newpagetitle'}).getText()
-        table = div.find('table', attrs={'class':'fulldraftorder'})
-        rows = table.findAll('tr')[1:]  # skip the first row.
+        h1 = rows.grabbed.get('h1', '')
 
         nflteampicks = collections.defaultdict(list)
 
-        for row in rows:
-            tds = row.findAll('td')
-            team = tds[0].getText().strip().replace('WAS','WSH')  # again a hack for people using WAS instead of WSH.
-            numofpicks = tds[1].getText().strip()
-            pickrounds = tds[2].getText().strip()
+        for (team, numofpicks, pickrounds) in rows:
             appendString = "({0}) Picks: {1}".format(numofpicks, pickrounds)
             nflteampicks[str(team)].append(appendString)
 
@@ -1558,7 +1779,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
 
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('div', {'id':'content'}), fromEncoding='utf-8')
         if not soup.find('div', attrs={'id':'content'}):
             irc.reply("ERROR: Something broke in formatting on the NFL Draft order page.")
             return
@@ -1603,7 +1824,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
 
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('table', {'class':'tablehead', 'cellpadding':'3'}), fromEncoding='utf-8')
         if not soup.find('table', attrs={'class':'tablehead', 'cellpadding':'3'}):
             irc.reply("Failed to find table for parsing.")
             return
@@ -1641,10 +1862,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
 
         lookupteam = self._translateTeam('eid', 'team', optteam)
 
@@ -1655,7 +1877,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
 
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         t1 = soup.findAll('div', attrs={'class':re.compile('(^ind tL$|^ind alt$|^ind$)')})
 
         if len(t1) < 1:
@@ -1669,6 +1891,10 @@ class NFL(callbacks.Plugin):
 
     nflteamtrans = wrap(nflteamtrans, [('somethingWithoutSpaces')])
 
+    _injurytable = parsers.TableSpec(('table', {'align':'center', 'width':'600px;'}), (('name', 0, lambda td: td.find('a') or td), ('position', 2),\
+        ('status', 3), ('date', 4), ('injury', 5), ('returns', 6)),\
+        grab={'team': ('a', {}, ('div', {'class':'player'}))}, skip=1)
+
     def nflinjury(self, irc, msg, args, optlist, optteam):
         """[--details] <TEAM>
         Show all injuries for team.
@@ -1683,10 +1909,11 @@ class NFL(callbacks.Plugin):
                 details = True
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
 
         lookupteam = self._translateTeam('roto', 'team', optteam)
 
@@ -1697,26 +1924,11 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
 
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        if soup.find('div', attrs={'class': 'player'}):
-            team = soup.find('div', attrs={'class': 'player'}).find('a').getText()
-        else:
+        object_list = self._table(self._injurytable, html, fromEncoding='utf-8')
+        if object_list is None or 'team' not in object_list.grabbed:
             irc.reply("No injuries found for: %s" % optteam)
             return
-
-        table = soup.find('table', attrs={'align': 'center', 'width': '600px;'})
-        t1 = table.findAll('tr')
-        object_list = []
-        for row in t1[1:]:
-            td = row.findAll('td')
-            d = collections.OrderedDict()
-            d['name'] = td[0].find('a').text
-            d['position'] = td[2].renderContents().strip()
-            d['status'] = td[3].renderContents().strip()
-            d['date'] = td[4].renderContents().strip().replace("&nbsp;", " ")
-            d['injury'] = td[5].renderContents().strip()
-            d['returns'] = td[6].renderContents().strip()
-            object_list.append(d)
+        team = object_list.grabbed['team']
 
         if len(object_list) < 1:
             irc.reply("No injuries for: %s" % optteam)
@@ -1728,11 +1940,11 @@ class NFL(callbacks.Plugin):
 
             for inj in object_list:
                 output = "{0:27} {1:<3} {2:<15} {3:<7} {4:<15} {5:<10}".format(self._bold( \
-                    inj['name']),inj['position'],inj['status'],inj['date'],inj['injury'],inj['returns'])
+                    inj.name),inj.position,inj.status,inj.date,inj.injury,inj.returns)
                 irc.reply(output)
         else:
             irc.reply("{0} - {1} total injuries".format(self._ul(team), len(object_list)))
-            irc.reply(" | ".join([item['name'] + " (" + item['returns'] + ")" for item in object_list]))
+            irc.reply(" | ".join([item.name + " (" + item.returns + ")" for item in object_list]))
 
     nflinjury = wrap(nflinjury, [getopts({'details':''}), ('somethingWithoutSpaces')])
 
@@ -1748,7 +1960,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
 
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('tbody', {'id':'listbody'}), fromEncoding='utf-8')
         tbody = soup.find('tbody', attrs={'id':'listbody'})
         rows = tbody.findAll('tr')
 
@@ -1766,27 +1978,11 @@ class NFL(callbacks.Plugin):
 
     nflvaluations = wrap(nflvaluations)
 
-    def nflpowerrankings(self, irc, msg, args, optteam):
-        """[team]
-        Display this week's NFL Power Rankings.
-        Optional: use [team] to display specific commentary. Ex: ATL
-        """
-
-        if optteam:  # if we have a team, check if its valid.
-            # test for valid teams.
-            optteam = self._validteams(optteam)
-            if not optteam: # team is not found in aliases or validteams.
-                irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
-                return
+    def _powerrankingstable(self, html):
+        """Extract the power rankings page into (headline, date, one-line list, team -> commentary).
+        For nflpowerrankings (see _parsed)."""
 
-        url = self._b64decode('aHR0cDovL2VzcG4uZ28uY29tL25mbC9wb3dlcnJhbmtpbmdz')
-        html = self._httpget(url)
-        if not html:
-            irc.reply("ERROR: Failed to fetch {0}.".format(url))
-            self.log.error("ERROR opening {0}".format(url))
-            return
-        # process HTML
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('div', {'class':'date floatleft'}), ('table', {'class':'tablehead'}), fromEncoding='utf-8')
         datehead = soup.find('div', attrs={'class':'date floatleft'})
         table = soup.find('table', attrs={'class':'tablehead'})
         headline = table.find('tr', attrs={'class':'stathead'})
@@ -1795,12 +1991,12 @@ class NFL(callbacks.Plugin):
         powerrankings = []  # list to hold each one.
         prtable = {}
 
-        for row in rows:  # one row per team.
-            teamdict = {}  # teamdict to put into powerrankings list.
-            tds = row.findAll('td')  # findall tds.
+        rows = [row.findAll('td') for row in rows]  # one row per team. findall tds.
+        names = [tds[1].find('div', attrs={'style':'padding:10px 0;'}).find('a').getText() for tds in rows]  # finds short.
+        shortteams = self._translateTeams('team', 'short', [str(team) for team in names])  # small abbreviation via the db.
+
+        for (tds, team, shortteam) in zip(rows, names, shortteams):
             rank = tds[0].getText()  # rank number.
-            team = tds[1].find('div', attrs={'style':'padding:10px 0;'}).find('a').getText()  # finds short.
-            shortteam = self._translateTeam('team', 'short', str(team))  # small abbreviation via the db.
             lastweek = tds[2].find('span', attrs={'class':'pr-last'}).getText().replace('Last Week:','').strip()  # rank #
             comment = tds[3].getText()  # comment.
             # check if we're up or down and insert a symbol.
@@ -1815,9 +2011,34 @@ class NFL(callbacks.Plugin):
             powerrankings.append("{0}. {1} (prev: {2} {3})".format(rank,shortteam,symbol,lastweek))
             prtable[str(shortteam)] = "{0}. {1} (prev: {2} {3}) {4}".format(rank,team,symbol,lastweek,comment)
 
+        return (headline.getText(), datehead.getText(), powerrankings, prtable)
+
+    def nflpowerrankings(self, irc, msg, args, optteam):
+        """[team]
+        Display this week's NFL Power Rankings.
+        Optional: use [team] to display specific commentary. Ex: ATL
+        """
+
+        if optteam:  # if we have a team, check if its valid.
+            # test for valid teams.
+            team = self._validteams(optteam)
+            if not team: # team is not found in aliases or validteams.
+                irc.reply(self._teamnotfound(optteam))
+                return
+            optteam = team
+
+        url = self._b64decode('aHR0cDovL2VzcG4uZ28uY29tL25mbC9wb3dlcnJhbmtpbmdz')
+        html = self._httpget(url)
+        if not html:
+            irc.reply("ERROR: Failed to fetch {0}.".format(url))
+            self.log.error("ERROR opening {0}".format(url))
+            return
+        # process HTML. shared via the cache so read only.
+        (headline, datehead, powerrankings, prtable) = self._parsed(url, html, self._powerrankingstable, 1)
+
         # now output. conditional if we have the team or not.
         if not optteam:  # no team so output the list.
-            irc.reply("{0} :: {1}".format(self._blue(headline.getText()), datehead.getText()))
+            irc.reply("{0} :: {1}".format(self._blue(headline), datehead))
             for N in self._batch(powerrankings, 12):  # iterate through each team. 12 per line
                 #
                 irc.reply("{0}".format(" | ".join([item for item in N])))
@@ -1827,7 +2048,7 @@ class NFL(callbacks.Plugin):
                 irc.reply("I could not find: %s - Something must have gone wrong." % optteam)
                 return
             else:
-                irc.reply("{0} :: {1}".format(self._blue(headline.getText()), datehead.getText()))
+                irc.reply("{0} :: {1}".format(self._blue(headline), datehead))
                 irc.reply("{0}".format(output))
 
     nflpowerrankings = wrap(nflpowerrankings, [optional('somethingWithoutSpaces')])
@@ -1845,10 +2066,11 @@ class NFL(callbacks.Plugin):
                 fullSchedule = True
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
 
         lookupteam = self._translateTeam('eid', 'team', optteam) # don't need a check for 0 here because we validate prior.
 
@@ -1861,7 +2083,7 @@ class NFL(callbacks.Plugin):
                 self.log.error("ERROR opening {0}".format(url))
                 return
 
-            soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+            soup = self._soup(html, ('table', {'class':'table'}), fromEncoding='utf-8')
             table = soup.find('table', attrs={'class':'table'})
             # make sure we have table
             rows = table.findAll('tr')
@@ -1891,7 +2113,7 @@ class NFL(callbacks.Plugin):
             # clean this stuff up
             html = html.replace('<![CDATA[','').replace(']]>','').replace('EDT','').replace('\xc2\xa0',' ')
 
-            soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+            soup = self._soup(html, fromEncoding='utf-8')
             items = soup.find('channel').findAll('item')
 
             append_list = []
@@ -1973,7 +2195,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('table', {'class':'sortable'}), fromEncoding='utf-8')
         table = soup.find('table', attrs={'class':'sortable'})
         h2 = 'PFF Team Stats' #soup.find('h2').getText().strip()
         rows = table.findAll('tr')
@@ -2048,7 +2270,7 @@ class NFL(callbacks.Plugin):
             irc.reply("ERROR: I did not find any draft pick data available for that year.")
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('table', {'class':'tablehead draft-tracker'}), ('h2', None), fromEncoding='utf-8')
         table = soup.find('table', attrs={'class':'tablehead draft-tracker'})
         h2 = soup.find('h2').getText().strip()
         rows = table.findAll('tr', attrs={'class': re.compile('^oddrow.*?|^evenrow.*?')})
@@ -2083,7 +2305,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         table = soup.find('table', attrs={'border':'0'})
         tbodys = table.findAll('tbody')
         # list for output
@@ -2124,7 +2346,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         lastDate = soup.findAll('span', attrs={'class': 'time'})[0]
         divs = soup.findAll('div', attrs={'class': 'entry'})
         # list container for output.
@@ -2188,7 +2410,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
 
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('div', {'class': 'mod-header stathead'}), ('table', {'class': 'tablehead'}), fromEncoding='utf-8')
         title = soup.find('div', attrs={'class': 'mod-header stathead'}).find('h4')
         table = soup.find('table', attrs={'class': 'tablehead'})
         rows = table.findAll('tr', attrs={'class': re.compile('^(odd|even)row.*')})[0:10]
@@ -2213,10 +2435,11 @@ class NFL(callbacks.Plugin):
         """
 
         # test for valid teams.
-        optteam = self._validteams(optteam)
-        if not optteam: # team is not found in aliases or validteams.
-            irc.reply("ERROR: Team not found. Valid teams are: {0}".format(self._allteams()))
+        team = self._validteams(optteam)
+        if not team: # team is not found in aliases or validteams.
+            irc.reply(self._teamnotfound(optteam))
             return
+        optteam = team
         # fetch url.
         url = self._b64decode('aHR0cDovL2VzcG4uZ28uY29tL25mbC9jb2FjaGVz')
         html = self._httpget(url)
@@ -2225,7 +2448,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, ('div', {'id': 'my-players-table'}), fromEncoding='utf-8')
         div = soup.find('div', attrs={'id': 'my-players-table'})
         table = div.find('table', attrs={'class': 'tablehead'})
         rows = table.findAll('tr', attrs={'class': re.compile('(odd|even)row')})
@@ -2261,14 +2484,14 @@ class NFL(callbacks.Plugin):
             irc.reply("ERROR: Failed to fetch {0}.".format(url))
             self.log.error("ERROR opening {0}".format(url))
             return
-        # try and process json.
+        # try and process json. we only need the first six.
         try:
-            jsondata = json.loads(html)['content']
+            jsondata = self._jsonfeed(url, html, 6, 'content')
         except:
             irc.reply("ERROR: Failed to parse article json from: {0}".format(url))
             return
         # iterate through and output.
-        for article in jsondata[0:6]:
+        for article in jsondata:
             title = article.get('title')
             # desc = article.get('description')
             link = article.get('linkURL')
@@ -2294,7 +2517,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0}".format(url))
             return
             # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         divs = soup.findAll('div', attrs={'id':re.compile('^\d+-gameContainer')})
         # check to make sure we found games.
         if len(divs) == 0:
@@ -2309,8 +2532,8 @@ class NFL(callbacks.Plugin):
             ateam = div.find('p', attrs={'id':'%s-aNameOffset' % gameid})
             hteam = div.find('p', attrs={'id':'%s-hNameOffset' % gameid})
             # clean-up the names for better matching.
-            ateam = ateam.getText().lower().strip().replace('&amp;', '&').replace('.', '')
-            hteam = hteam.getText().lower().strip().replace('&amp;', '&').replace('.', '')
+            ateam = parsers.unescape(ateam.getText()).lower().strip().replace('.', '')
+            hteam = parsers.unescape(hteam.getText()).lower().strip().replace('.', '')
             games[ateam] = gameid  # inject away
             games[hteam] = gameid  # inject home.
 
@@ -2335,7 +2558,7 @@ class NFL(callbacks.Plugin):
             irc.reply("ERROR: Box score is currently unavailable at: {0} . Checking too early?".format(url))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         tsh4 = soup.find('h4', text="Team Stat Comparison")
         if not tsh4:  # sanity check.
             irc.reply("ERROR: Something went wrong finding Team Stats in gameid: {0}. Checking too early?".format(gid))
@@ -2346,25 +2569,13 @@ class NFL(callbacks.Plugin):
         tsteams = tshead.findAll('th', attrs={'nowrap':'nowrap'})  # find the 2x TH with teams.
         teams = {}  # teams container
         for i, tsteam in enumerate(tsteams):  # iterate over these two.
-            teams[i] = tsteam.getText().replace('&amp;', '&')  # inject into the dict.
+            teams[i] = parsers.unescape(tsteam.getText())  # inject into the dict.
         # now find the tbody with stats.
         tsrows = tscontent.findAll('tr', attrs={'class':re.compile('odd|even')})
         tsstats = collections.defaultdict(list)  # container for the stats.
         for tsrow in tsrows:  # iterate over rows. each row has two tds.
             tds = tsrow.findAll('td')  # find all tds. There should be three per row.
-            stat = tds[0].getText()  # statname. below, we shorten things.
-            # 1st Downs: 22 | Passing 1st downs: 12 | Rushing 1st downs: 8 | 1st downs from Penalties: 2 | 3rd down efficiency: 7-17 |
-            # 4th down efficiency: 0-1 | Total Plays: 79 | Total Yards: 407 | Yards per play: 5.2 | Total Drives: 12 | Passing: 280 |
-            # Comp - Att: 25-45 | Yards per pass: 6.2 | Interceptions thrown: 0 | Sacks - Yards Lost: 0-0 | Rushing: 127 | Rushing Attempts: 34 | Yards
-            # per rush: 3.7 | Red Zone (Made-Att): 1-2 | Penalties: 9-84 | Turnovers: 0 | Fumbles lost: 0 | Interceptions thrown: 0 |
-            # Defensive / Special Teams TDs: 0 | Possession: 35:34
-            stat = stat.replace('1st Downs', '1stD').replace('Passing 1st downs', 'Pass').replace('Rushing 1st downs', 'Rush').replace('1st downs from Penalties', 'Pen')
-            stat = stat.replace('3rd down efficiency', '3rdD EFF').replace('4th down efficiency', '4thD EFF').replace('Total Plays', 'Plys').replace('Total Yards', 'YDS')
-            stat = stat.replace('Yards per play', 'YPP').replace('Total Drives', 'Drvs').replace('Comp - Att', 'C-A').replace('Defensive / Special Teams TDs', 'D/ST TDs')
-            stat = stat.replace('Yards per pass', 'YPP').replace('Interceptions thrown', 'INT').replace('Sacks - Yards Lost', 'S-YL')
-            stat = stat.replace('Rushing Attempts', 'R-ATT').replace('Yards per rush', 'YPR').replace('Red Zone (Made-Att)', 'RZ (Made-Att)').replace('Penalties', 'PEN')
-            stat = stat.replace('Turnovers', 'TO').replace('Fumbles lost', 'Fum lst').replace('Intercceptions thrown', 'INT')
-            stat = stat.replace('Possession', 'TOP').replace('Passing', 'PASS').replace('Rushing', 'RUSH')
+            stat = self._statlabels(tds[0].getText())  # statname, shortened.
             tsstats[teams[0]].append("{0}: {1}".format(self._bold(stat), tds[1].getText()))  # inject away stats. bold category.
             tsstats[teams[1]].append("{0}: {1}".format(self._bold(stat), tds[2].getText()))  # inject home stats. bolc category.
         # now we prepare to output.
@@ -2391,10 +2602,8 @@ class NFL(callbacks.Plugin):
                 showFull = True  # showFull is on.
 
         optplayer = self._sanitizeName(optname)  # sanitize optname.
-        with sqlite3.connect(self._playersdb) as db:  # connect to db.
-            cursor = db.cursor()  # below, we select eid/rid/fullname %name% and replace spaces in name with %.
-            cursor.execute("SELECT eid, rid, fullname FROM players WHERE fullname LIKE ? ORDER BY eid", ('%'+optplayer.replace(' ','%')+'%',))
-            rows = cursor.fetchall()
+        # below, we select eid/rid/fullname %name% and replace spaces in name with %. eid order.
+        rows = [(row['eid'], row['rid'], row['fullname']) for row in self._players.current().like('%'+optplayer.replace(' ','%')+'%')]
         # check if we found anything.
         if len(rows) == 0:
             irc.reply("ERROR: Sorry, I did not find any players matching {0}".format(optname))
@@ -2442,7 +2651,7 @@ class NFL(callbacks.Plugin):
                 self.log.error("ERROR opening {0} looking up {1}".format(url, optplayer))
                 return
             # process html.
-            soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+            soup = self._soup(html, fromEncoding='utf-8')
             playerName = soup.find('div', attrs={'class': 'sub bold'})
             if not playerName:  # sanity check here.
                 irc.reply("I could not find any news. Did formatting change?")
@@ -2479,8 +2688,8 @@ class NFL(callbacks.Plugin):
                 irc.reply("ERROR: Failed to fetch {0}.".format(url))
                 self.log.error("ERROR opening {0} looking up {1}".format(url, optplayer))
                 return
-            # parse json
-            jsondata = json.loads(html)
+            # parse json. only the latest item matters.
+            jsondata = self._jsonfeed(url, html, 1)
             # check to make sure we have news and build output string.
             if len(jsondata) < 1:  # generic error here.
                 playerNews = "I did not find any news for player."
@@ -2494,9 +2703,9 @@ class NFL(callbacks.Plugin):
                 # now construct playernews string for output.
                 playerNews = ""
                 if timestamp: playerNews += "{0}".format(timestamp)
-                if headline: playerNews += " {0}".format(headline.encode('utf-8').replace('&quot;', '"'))
-                if news: playerNews += " {0}".format(news.encode('utf-8').replace('&quot;', '"'))
-                if impact: playerNews += " {0}".format(impact.encode('utf-8').replace('&quot;', '"'))  #self._remove_accents(impact))
+                if headline: playerNews += " {0}".format(parsers.unescape(headline).encode('utf-8'))
+                if news: playerNews += " {0}".format(parsers.unescape(news).encode('utf-8'))
+                if impact: playerNews += " {0}".format(parsers.unescape(impact).encode('utf-8'))  #self._remove_accents(impact))
 
         # finally, lets output. this works with both methods above.
         output = "{0} :: {1}".format(self._red(playerName), utils.str.normalizeWhitespace(playerNews))
@@ -2527,7 +2736,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0} looking up {1}".format(url, optplayer))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         # find the main div
         div = soup.find('div', attrs={'class':'mod-container mod-no-header-footer mod-page-header'})
         if not div:
@@ -2580,7 +2789,7 @@ class NFL(callbacks.Plugin):
             self.log.error("ERROR opening {0} looking up {1}".format(url, optplayer))
             return
         # process HTML.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         pn = soup.find('div', attrs={'class':'playercard', 'style':'display:none;', 'id': re.compile('^cont_.*')})
         if not pn:  # check and make sure we have a contract.
             irc.reply("ERROR: No contract found for: {0}".format(optplayer))
@@ -2622,7 +2831,7 @@ class NFL(callbacks.Plugin):
             irc.reply("ERROR: No statistics found on the player page for: {0}".format(optplayer.title()))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         h4 = soup.find('h4', text="CURRENT GAME")
         if not h4:
             h4 = soup.find('h4', text="PREVIOUS GAME")
@@ -2707,7 +2916,7 @@ class NFL(callbacks.Plugin):
             irc.reply("No stats available for: {0}. Perhaps they play a position without formal stats?".format(optplayer))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         if not soup.find('a', attrs={'class': 'btn-split-btn'}): # check if player is active.
             irc.reply("ERROR: Cannot find any career stats for an inactive/unsigned player: %s" % optplayer)
             return
@@ -2750,7 +2959,7 @@ class NFL(callbacks.Plugin):
                     for i, total in enumerate(totals):
                         tmplist.append(self._bold(colhead[i+1].getText()) + ": " + total.getText())
                     stats[int(f)] = tmplist
-                    statcategories[str(stathead.getText().replace('Stats', '').strip().lower())] = f
+                    statcategories[str(self._statlabels(stathead.getText()).strip().lower())] = f
         # prepare output string.
         careerstats = {}
         # grab the stat categories for this position.
@@ -2819,7 +3028,7 @@ class NFL(callbacks.Plugin):
             irc.reply("ERROR: No stats available for: {0}".format(optplayer))
             return
         # process html.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
+        soup = self._soup(html, fromEncoding='utf-8')
         if not soup.find('a', attrs={'class':'btn-split-btn'}):  # check if player is active.
             irc.reply("ERROR: Cannot find any season stats for an inactive/unsigned player: {0}".format(optplayer))
             return
@@ -2913,7 +3122,7 @@ class NFL(callbacks.Plugin):
             url = self._b64decode('aHR0cDovL2VzcG4uZ28uY29tL25mbC9wbGF5ZXIvZ2FtZWxvZy9fL2lkLw==') + '%s/year/%s/' % (lookupid, str(optyear))
         else:
             url = self._b64decode('aHR0cDovL2VzcG4uZ28uY29tL25mbC9wbGF5ZXIvZ2FtZWxvZy9fL2lkLw==') + '%s/' % (lookupid)
-        html = self._httpget(url)
+        html = self._httpget(url, stop=('mod-player-stats', '</table>'))  # player, year picker and the gamelog come first.
         if not html:
             irc.reply("ERROR: Failed to fetch {0}.".format(url))
             self.log.error("ERROR opening {0}".format(url))
@@ -2923,22 +3132,24 @@ class NFL(callbacks.Plugin):
             irc.reply("ERROR: Something broke loading stats for: {0}. Check to make sure year is correct or formatting did not change.".format(optplayer))
             return
         # process html. put some additional error checks in because it can be iffy.
-        soup = BeautifulSoup(html, convertEntities=BeautifulSoup.HTML_ENTITIES, fromEncoding='utf-8')
-        div = soup.find('div', attrs={'class':'mod-container mod-table mod-player-stats'})
+        stream = self._stream(('table', {'class':'tablehead'}), within=('div', {'class':'mod-container mod-table mod-player-stats'}),\
+            grab={'player': ('a', {'class':'btn-split-btn'}), 'year': ('option', {'selected':'selected'}, ('select', {'class':'tablesm'}))})
+        stathead, header, rows = [], [], []
+        for row in stream.rows(html, fromEncoding='utf-8'):
+            rowclass = row.get('class', '')
+            if rowclass == 'stathead' and not stathead:
+                stathead = [td for td in row if td.name == 'td']
+            elif rowclass == 'colhead' and not header:
+                header = [td for td in row if td.name == 'td']
+            elif re.match('^oddrow.*?|^evenrow.*?', rowclass):
+                rows.append(row)
         # more sanity checks.
-        if not div:  # one check.
-            irc.reply("ERROR: Something broke loading the gamelog. Player might have no stats or gamelog due to position.")
-            return
-        table = div.find('table', attrs={'class':'tablehead'})
-        if not table:  # second check.
+        if not stream.found or 'player' not in stream.grabbed:
             irc.reply("ERROR: Something broke loading the gamelog. Player might have no stats or gamelog due to position.")
             return
         # we're good so lets grab our html.
-        playername = soup.find('a', attrs={'class':'btn-split-btn'}).getText().strip()
-        stathead = table.find('tr', attrs={'class':'stathead'}).findAll('td')
-        header = table.find('tr', attrs={'class':'colhead'}).findAll('td')
-        rows = table.findAll('tr', attrs={'class': re.compile('^oddrow.*?|^evenrow.*?')})
-        selectedyear = soup.find('select', attrs={'class':'tablesm'}).find('option', attrs={'selected':'selected'})
+        playername = stream.grabbed['player']
+        selectedyear = stream.grabbed.get('year', optyear or 'this season')
         # last check before we process the data.
         if len(rows) < 1 or len(header) < 1 or len(stathead) < 1:
             irc.reply("ERROR: I did not find any gamelog data for: {0} (Check formatting on gamelog page).".format(optplayer))
@@ -2952,7 +3163,7 @@ class NFL(callbacks.Plugin):
         statheaddict = {}
         for e, blah in enumerate(stathead):
             tmpdict = {}
-            tmpdict[str(blah['colspan'])] = str(blah.text)
+            tmpdict[str(blah.get('colspan'))] = str(blah)
             statheaddict[e] = tmpdict
         # now, we have the statheadlist, create statheadlist to be the list of
         # each header[i] colspan element, where you can use its index value to ref.
@@ -2962,29 +3173,25 @@ class NFL(callbacks.Plugin):
         statheadlist = []
         for q, x in sorted(statheaddict.items()):  # sorted dict, x is the "dict" inside.
             for k, v in x.items():  # key = colspan, v = the td parent header
-                for each in range(int(k)):  # range the number to insert.
-                    # do some replacement (truncating) because we use this in output.
-                    v = v.replace('PASSING','PASS').replace('RUSHING','RUSH').replace('PUNTING','PUNT-')
-                    v = v.replace('RECEIVING','REC').replace('FUMBLES','FUM').replace('TACKLES','TACK')
-                    v = v.replace('INTERCEPTIONS','INT').replace('FIELD GOALS','FG').replace('PATS','XP')
-                    statheadlist.append(v)  # add to list.
+                v = self._statlabels(v)  # shorten (truncate) because we use this in output.
+                statheadlist.extend([v] * int(k))  # once per column it spans.
         # now, we put all of the data into a data structure
         gamelist, games = {}, {}  # gamelist dict. one game per entry. games contains a list incase there is an error.
         # go through each row and extract, mate with header.
         for i, row in enumerate(rows):
             d = {}  # everything in an OD for calc/sort later.
-            tds = row.findAll('td')  # all td in each row.
+            tds = [td for td in row if td.name == 'td']  # all td in each row.
             week = i+1  # add in the week but +1 for human reference later.
             for f,td in enumerate(tds):  # within each round, there are tds w/data.
                 if f > 2:  # the first three will be game log parts, so append statheadlist from above.
-                    if str(statheadlist[f]) == str(header[f].getText()):  # check if key is there like INT so we don't double include
-                        d[header[f].getText()] = td.getText()  # this will just look normal like XPM or INT
+                    if str(statheadlist[f]) == str(header[f]):  # check if key is there like INT so we don't double include
+                        d[header[f]] = td  # this will just look normal like XPM or INT
                     else:  # regular "addtiion" where it is something like FUM-FF
-                        d[statheadlist[f] + "-" + header[f].getText()] = td.getText()
+                        d[statheadlist[f] + "-" + header[f]] = td
                 else:  # td entries 2 and under like DATE, OPP, RESULT
-                    d[header[f].getText()] = td.getText()  # inject all into the OD.
+                    d[header[f]] = td  # inject all into the OD.
             # we also add into games so we can print to the user a list of games we have.
-            games[week] = tds[1].getText()
+            games[week] = tds[1]
             # finally, each game and its data in OD now injected into object_list.
             gamelist[week] = d
 
@@ -2995,7 +3202,7 @@ class NFL(callbacks.Plugin):
         outputgame = gamelist.get(optgame)
         if not outputgame:  # handle finding the game or not for output.
             g = " | ".join([str(k) + ": " + v for (k, v) in sorted(games.items())])
-            irc.reply("ERROR: I did not find game number {0} in {1} for {2}. I do have: {3}".format(optgame, selectedyear.getText(), playername, g))
+            irc.reply("ERROR: I did not find game number {0} in {1} for {2}. I do have: {3}".format(optgame, selectedyear, playername, g))
             return
         else:  # we did find an outputgame, so go out.
             output = " | ".join([self._bold(z) + ": " + x for (z, x) in sorted(outputgame.items())])
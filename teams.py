@@ -0,0 +1,301 @@
+# -*- coding: utf-8 -*-
+###
+# Copyright (c) 2012-2014, spline
+# All rights reserved.
+###
+# Team and player tables kept in memory. No supybot imports in here.
+import bisect
+import difflib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+class TeamRegistry(object):
+    """Every row of the nfl table and every nflteamaliases alias, read once from
+    the db at path. Each column is indexed by value, so translating between any
+    two columns (team, eid, roto, yahoo, spotrac, pfrurl, short, full, ...) is a
+    dict lookup. Values are kept as str, like the queries they replace returned.
+    connect(path), if given, hands out the connection to read with; it stays open."""
+
+    def __init__(self, path, connect=None):
+        conn = connect(path) if connect else sqlite3.connect(path)
+        try:
+            cursor = conn.execute("SELECT * FROM nfl ORDER BY rowid")
+            self.columns = tuple([d[0] for d in cursor.description])
+            self.rows = [dict(zip(self.columns, [_str(v) for v in row])) for row in cursor.fetchall()]
+            self.aliases = [(str(alias).lower(), str(team)) for (team, alias) in conn.execute("SELECT team, teamalias FROM nflteamaliases ORDER BY rowid")]
+        finally:
+            if not connect:
+                conn.close()
+        self._by = {}  # column -> value -> row. first row wins, like fetchone() did.
+        for column in self.columns:
+            index = self._by[column] = {}
+            for row in self.rows:
+                index.setdefault(row[column], row)
+        # every alias plus each team's abbreviation, full and short name.
+        names = list(self.aliases)
+        for row in self.rows:
+            names.extend([(row[column].lower(), row['team']) for column in ('team', 'full', 'short')])
+        self.index = AliasIndex(names)
+        self._maps = {}  # (column, by) -> {value: column}, built on first translate_many.
+
+    def translate(self, column, by, value):
+        """column of the team whose by column is value. Raises KeyError if no team has it."""
+
+        return self._by[by][_str(value)][column]
+
+    def translate_many(self, column, by, values):
+        """translate() for every value in values, in order. A value no team has
+        (an old franchise, a typo on the page) comes back unchanged."""
+
+        mapping = self._maps.get((column, by))
+        if mapping is None:
+            mapping = self._maps[(column, by)] = dict([(value, row[column]) for (value, row) in self._by[by].items()])
+        return [mapping.get(_str(value), value) for value in values]
+
+    def valid(self, team):
+        """team if it is a team's abbreviation (exact, like NE), else None."""
+
+        return team if team in self._by['team'] else None
+
+    def alias(self, text):
+        """Abbreviation of the best ranked team for text (see AliasIndex.match), or None."""
+
+        teams = self.index.match(text)
+        return teams[0] if teams else None
+
+    def teams(self, conf=None, div=None):
+        """Sorted abbreviations of every team, or those in conf (and div)."""
+
+        return sorted([row['team'] for row in self.rows if (not conf or row['conf'] == conf) and (not div or row['div'] == div)])
+
+
+def _str(value):
+    """value as a (utf-8) str, the way the registry keys its values."""
+
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
+
+
+class AliasIndex(object):
+    """Team names (alias, team) indexed three ways. match() ranks, in order:
+    an exact alias, then aliases text starts, then aliases text is inside of.
+    Within a kind the earlier and shorter alias wins, then the abbreviation,
+    so the same text always gives the same team whatever order rows came in."""
+
+    def __init__(self, names):
+        self._exact = {}
+        for (alias, team) in names:
+            self._exact.setdefault(alias, set()).add(team)
+        # suffix array: every suffix of every alias, sorted. prefix and substring
+        # lookups are then one bisect and a walk over the hits.
+        self._suffixes = sorted(set([(alias[i:], i, len(alias), team)
+                                     for (alias, team) in names for i in range(len(alias))]))
+        self._names = sorted(self._exact)
+
+    def match(self, text):
+        """Abbreviations of every team text names, best first. Empty if none."""
+
+        text = text.lower()
+        if not text:
+            return []
+        ranked = [(-1, 0, team) for team in self._exact.get(text, ())]
+        i = bisect.bisect_left(self._suffixes, (text,))
+        while i < len(self._suffixes) and self._suffixes[i][0].startswith(text):
+            ranked.append(self._suffixes[i][1:])
+            i += 1
+        teams = []
+        for (offset, length, team) in sorted(ranked):
+            if team not in teams:
+                teams.append(team)
+        return teams
+
+    def suggest(self, text, count=5):
+        """Up to count abbreviations of teams with a name close to text (typos), best first."""
+
+        teams = []
+        for name in difflib.get_close_matches(text.lower(), self._names, count * 2, 0.6):
+            for team in sorted(self._exact[name]):
+                if team not in teams:
+                    teams.append(team)
+        return teams[:count]
+
+
+class PlayerIndex(object):
+    """The players and aliases tables of the player db at path, read once.
+    players are in eid order, so the first match of anything is the row
+    SQLite would have handed back first. connect is as for TeamRegistry."""
+
+    def __init__(self, path, connect=None):
+        conn = connect(path) if connect else sqlite3.connect(path)
+        try:
+            cursor = conn.execute("SELECT eid, rid, fullname, fndm1, fndm2, lndm1, lndm2 FROM players ORDER BY eid")
+            columns = [d[0] for d in cursor.description]
+            self.players = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            self.aliases = [(name.lower(), eid) for (eid, name) in conn.execute("SELECT id, name FROM aliases ORDER BY rowid")]
+        finally:
+            if not connect:
+                conn.close()
+        self._eids = dict([(row['eid'], row) for row in self.players])
+        self._lndm = {}  # primary last-name metaphone -> rows.
+        for row in self.players:
+            self._lndm.setdefault(row['lndm1'], []).append(row)
+
+    def alias(self, text):
+        """Player (lowest eid) with an alias containing text (any case), or None."""
+
+        text = _unicode(text).lower()
+        found = [eid for (name, eid) in self.aliases if text in name and eid in self._eids]
+        return self._eids[min(found)] if found else None
+
+    def like(self, pattern):
+        """Every player whose fullname matches the LIKE pattern (% and _ wildcards, any case)."""
+
+        match = _likere(pattern).match
+        return [row for row in self.players if match(row['fullname'])]
+
+    def sounds(self, lndm, fndm=None):
+        """First player whose last (and first) name double metaphone codes are lndm (and fndm).
+        A code pair with no secondary matches on the primary alone."""
+
+        for row in self._lndm.get(lndm[0], ()):
+            if lndm[1] and row['lndm2'] != lndm[1]:
+                continue
+            if fndm and (row['fndm1'] != fndm[0] or (fndm[1] and row['fndm2'] != fndm[1])):
+                continue
+            return row
+        return None
+
+
+def _unicode(text):
+    """text as unicode, like the db hands its strings back."""
+
+    if isinstance(text, str):
+        return text.decode('utf-8', 'replace')
+    return text
+
+
+def _likere(pattern):
+    """Compiled regex for a SQL LIKE pattern."""
+
+    parts = []
+    for c in _unicode(pattern):
+        parts.append('.*' if c == '%' else '.' if c == '_' else re.escape(c))
+    return re.compile(''.join(parts) + r'\Z', re.I | re.S | re.U)
+
+
+class Reloader(object):
+    """Holds what build(path) returns for the db file at path, and builds it
+    again once the file changes (inode, size or mtime, looked at no more than
+    every interval seconds). The new one is built in a background thread while
+    current() keeps handing out the old one, and goes in with a single
+    assignment once complete: a reader never sees half of one."""
+
+    def __init__(self, path, build, interval=5, log=None):
+        self.path = path
+        self.interval = interval
+        self.reloads = 0
+        self._build = build
+        self._log = log
+        self._lock = threading.Lock()
+        self._stamp = self._stat()
+        self._value = build(path)
+        self._checked = time.time()
+        self._building = None  # thread doing a rebuild, if one is.
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:  # being replaced. try again next time.
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime)
+
+    def current(self):
+        """The latest complete build. Starts a rebuild if the file changed."""
+
+        if time.time() - self._checked >= self.interval:
+            self.check()
+        return self._value
+
+    def check(self):
+        """Start a rebuild if the file changed since the last one. Returns its thread, or None."""
+
+        with self._lock:
+            self._checked = time.time()
+            if self._building:
+                return None
+            stamp = self._stat()
+            if not stamp or stamp == self._stamp:
+                return None
+            self._building = threading.Thread(target=self._rebuild, args=(stamp,))
+            self._building.daemon = True
+            self._building.start()
+            return self._building
+
+    def _rebuild(self, stamp):
+        try:
+            value = self._build(self.path)
+        except Exception as e:  # locked mid-write, say. stamp stays old so the next check retries.
+            if self._log:
+                self._log.error("Failed to reload {0}: {1}".format(self.path, e))
+        else:
+            self._value = value
+            self._stamp = stamp
+            self.reloads += 1
+        finally:
+            self._building = None
+
+
+class DbConnections(object):
+    """Read-only sqlite connections kept open, one per db file, so reading a db
+    again reuses its connection and prepared statements. Each file's connection
+    must have one user at a time: its Reloader, whose builds never overlap. A
+    connection to a file that has since been replaced (new inode) is reopened."""
+
+    def __init__(self, cachedstatements=200, cachekb=8192, mmapbytes=64 * 1024 * 1024):
+        self.cachedstatements = cachedstatements
+        self.cachekb = cachekb
+        self.mmapbytes = mmapbytes
+        self.opened = 0
+        self._conns = {}  # path -> (conn, inode)
+        self._lock = threading.Lock()
+
+    def _open(self, path):
+        # builds run on a new thread each time, hence check_same_thread. python 2's
+        # sqlite3 can't open mode=ro uris, so writes are refused with a pragma.
+        conn = sqlite3.connect(path, check_same_thread=False, cached_statements=self.cachedstatements)
+        conn.execute("PRAGMA query_only = 1")
+        conn.execute("PRAGMA cache_size = -{0}".format(int(self.cachekb)))
+        conn.execute("PRAGMA mmap_size = {0}".format(int(self.mmapbytes)))
+        self.opened += 1
+        return conn
+
+    def get(self, path):
+        """The connection to the db at path, opened if need be."""
+
+        try:
+            inode = os.stat(path).st_ino
+        except OSError:
+            inode = None
+        with self._lock:
+            entry = self._conns.pop(path, None)
+            if entry and entry[1] == inode:
+                self._conns[path] = entry
+                return entry[0]
+            if entry:  # file was replaced under us.
+                entry[0].close()
+            conn = self._open(path)
+            self._conns[path] = (conn, inode)
+            return conn
+
+    def closeall(self):
+        """Close every connection. Used on unload."""
+
+        with self._lock:
+            for (conn, inode) in self._conns.values():
+                conn.close()
+            self._conns.clear()